@@ -0,0 +1,15 @@
+"""
+API routers for NeuroDrive
+
+The backend modules (embeddings, vector_db, search, ...) live in backend/,
+one level above the app directory uvicorn runs from. Put that directory on
+sys.path once, here, instead of in every router module.
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
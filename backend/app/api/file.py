@@ -1,39 +1,24 @@
-﻿from fastapi import APIRouter, HTTPException
-import sys
-import os
-
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
-from vector_db.faiss_db import FAISSDatabase
+﻿from fastapi import APIRouter, HTTPException, Request, Response
 
 router = APIRouter()
 
-db = None
-
 @router.get('/')
-def get_all_files():
+def get_all_files(request: Request, response: Response):
     '''Get list of all indexed files'''
-    global db
+    # Database is created once at startup (see main.lifespan)
+    db = request.app.state.db
     
     try:
-        if db is None:
-            db = FAISSDatabase(dimension=384)
-        
-        stats = db.get_stats()
-        
-        # Get all metadata
-        files = []
-        for metadata in db.metadata:
-            files.append({
-                'name': metadata['name'],
-                'path': metadata['path'],
-                'ext': metadata.get('ext', ''),
-                'size': metadata.get('size', 0)
-            })
+        # Unchanged since the client's last fetch: skip the body entirely
+        etag = f'"{db.version}"'
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers={'ETag': etag})
+        response.headers['ETag'] = etag
         
+        # file_list is maintained by the database as files are added
         return {
-            'files': files,
-            'total': stats['total_vectors']
+            'files': db.file_list,
+            'total': len(db.file_list)
         }
         
     except Exception as e:
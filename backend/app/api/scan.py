@@ -1,74 +1,173 @@
-﻿from fastapi import APIRouter, HTTPException
+﻿from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-import sys
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import numpy as np
 
-# Add backend to path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
-from file_scanner.scanner import scan_directory
+from file_scanner.scanner import scan_directory, hash_file
 from extraction.extraction_module import extract_content
-from embeddings.embedder import Embedder
-from vector_db.faiss_db import FAISSDatabase
+from cache.extraction_cache import ExtractionCache
+from vector_db.faiss_db import PREVIEW_CHARS
 
 router = APIRouter()
 
-# Initialize embedder and database (singleton pattern)
-embedder = None
-db = None
+# Embeddings of files that are unchanged since the previous scan
+extraction_cache = ExtractionCache()
+
+SUPPORTED_EXTENSIONS = frozenset({'.pdf', '.docx', '.txt'})
+
+# Only this much text is embedded or previewed; extraction stops reading there
+MAX_TEXT_CHARS = 50000
 
 class ScanRequest(BaseModel):
     folder_path: str
 
+def build_file_info(file, preview):
+    '''Metadata stored alongside a file's vector'''
+    return {
+        'path': file['path'],
+        'name': file['name'],
+        'ext': file['ext'],
+        'size': file.get('size', 0),
+        'preview': preview,
+        'content_hash': file['content_hash']
+    }
+
 @router.post('/')
-def scan_and_index(request: ScanRequest):
+def scan_and_index(request: ScanRequest, http_request: Request):
     '''Scan folder, extract text, create embeddings, and store in FAISS'''
-    global embedder, db
+    # Embedder and database are created once at startup (see main.lifespan)
+    embedder = http_request.app.state.embedder
+    db = http_request.app.state.db
     
     try:
-        # Initialize if needed
-        if embedder is None:
-            embedder = Embedder()
-        if db is None:
-            db = FAISSDatabase(dimension=embedder.get_dimension())
-        
-        # Step 1: Scan directory
-        files = scan_directory(request.folder_path)
-        if isinstance(files, dict) and 'error' in files:
-            raise HTTPException(status_code=400, detail=files['error'])
-        
-        # Step 2: Filter supported files
-        supported_exts = {'.pdf', '.docx', '.txt'}
-        supported_files = [f for f in files if f.get('ext') in supported_exts]
+        # Steps 1-2: Scan directory, keeping only supported file types
+        supported_files = scan_directory(request.folder_path, SUPPORTED_EXTENSIONS)
+        if isinstance(supported_files, dict) and 'error' in supported_files:
+            raise HTTPException(status_code=400, detail=supported_files['error'])
         
         if not supported_files:
             return {'message': 'No supported files found', 'files_indexed': 0}
         
-        # Step 3: Extract and embed
-        indexed_count = 0
+        # All vectors for this scan go into one preallocated matrix so the
+        # index receives a single contiguous add
+        matrix = np.empty((len(supported_files), embedder.get_dimension()), dtype=np.float32)
+        matrix_infos = []
+        
+        # Identical content (already indexed, or repeated within this scan)
+        # shares one vector: copies are stored as aliases, not as new rows
+        aliases = []  # (vector_id, info) for content already in the database
+        repeated = []  # (info, cache_key) for content first seen in this scan
+        cache_entries = []
+        
+        # Step 3: Reuse cached embeddings for files unchanged since the last scan
+        pending_files, seen_hashes = [], set()
         for file in supported_files:
-            text = extract_content(file['path'], file['ext'])
+            hit = extraction_cache.get(file['path'], file['mtime_ns'], file.get('size', 0))
+            if hit is None:
+                pending_files.append(file)
+                continue
+            
+            embedding, info = hit
+            if db.has_file(info['path'], info['content_hash']):
+                # Unchanged and still indexed; re-added only if the database was cleared
+                continue
+            duplicate = db.find_duplicate(info['content_hash'])
+            if duplicate is not None:
+                aliases.append((duplicate[0], info))
+            elif info['content_hash'] in seen_hashes:
+                repeated.append((info, None))
+            else:
+                seen_hashes.add(info['content_hash'])
+                matrix[len(matrix_infos)] = embedding
+                matrix_infos.append(info)
+        
+        # Step 3b: Hash the rest; copies skip extraction and embedding
+        unique_files = []
+        for file in pending_files:
+            try:
+                file['content_hash'] = hash_file(file['path'])
+            except OSError:
+                continue
+            
+            if db.has_file(file['path'], file['content_hash']):
+                continue
+            
+            cache_key = (file['mtime_ns'], file.get('size', 0))
+            duplicate = db.find_duplicate(file['content_hash'])
+            if duplicate is not None:
+                vector_id, vector, original = duplicate
+                info = build_file_info(file, original.get('preview', ''))
+                aliases.append((vector_id, info))
+                cache_entries.append((*cache_key, vector, info))
+            elif file['content_hash'] in seen_hashes:
+                repeated.append((build_file_info(file, ''), cache_key))
+            else:
+                seen_hashes.add(file['content_hash'])
+                unique_files.append(file)
+        pending_files = unique_files
+        
+        # Step 4: Extract text in parallel (PDF/DOCX parsing is CPU-bound)
+        # extract_content is module-level in extraction_module, so it pickles
+        # cleanly; map() keeps results aligned with pending_files
+        extracted = []
+        if pending_files:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                extracted = list(executor.map(
+                    extract_content,
+                    [f['path'] for f in pending_files],
+                    [f['ext'] for f in pending_files],
+                    repeat(MAX_TEXT_CHARS),
+                    chunksize=4
+                ))
+        
+        texts, infos, new_files = [], [], []
+        for file, text in zip(pending_files, extracted):
             if text and not text.startswith('Error'):
-                # Create embedding
-                embedding = embedder.encode(text)
-                
-                # Store in database
-                file_info = {
-                    'path': file['path'],
-                    'name': file['name'],
-                    'ext': file['ext'],
-                    'size': file.get('size', 0),
-                    'text': text
-                }
-                db.add(embedding, file_info)
-                indexed_count += 1
+                texts.append(text)
+                new_files.append(file)
+                infos.append(build_file_info(file, text[:PREVIEW_CHARS]))
+        
+        # Step 5: Embed new texts in one batched pass
+        if texts:
+            embeddings = embedder.encode(texts, batch_size=32)
+            start = len(matrix_infos)
+            matrix[start:start + len(embeddings)] = embeddings
+            matrix_infos.extend(infos)
+            cache_entries.extend(
+                (file['mtime_ns'], file.get('size', 0), embedding, info)
+                for file, embedding, info in zip(new_files, embeddings, infos)
+            )
+        
+        # Step 6: Store everything in the database with one index.add
+        start = len(db.metadata)
+        indexed_count = len(matrix_infos)
+        if indexed_count:
+            db.add_batch(matrix[:indexed_count], matrix_infos)
+        
+        # Copies of a file stored above point at its row (and are dropped
+        # with it if its extraction failed)
+        rows = {info['content_hash']: row for row, info in enumerate(matrix_infos)}
+        for info, cache_key in repeated:
+            row = rows.get(info['content_hash'])
+            if row is None:
+                continue
+            info['preview'] = matrix_infos[row]['preview']
+            aliases.append((start + row, info))
+            if cache_key is not None:
+                cache_entries.append((*cache_key, matrix[row], info))
+        indexed_count += db.add_aliases(aliases)
+        
+        if cache_entries:
+            extraction_cache.set_many(cache_entries)
         
-        # Save database
-        db.save()
+        # Persist the new vectors and aliases (appended to the database log)
+        db.flush()
         
         return {
             'message': 'Indexing complete',
-            'files_scanned': len(files),
+            'files_scanned': len(supported_files),
             'files_indexed': indexed_count
         }
         
@@ -4,37 +4,92 @@ Replaces: backend/app/api/scan.py
 Performance: 4-5x faster than original
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, List
-import sys
 import os
 import asyncio
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from pathlib import Path
+import threading
 import time
+from dataclasses import dataclass
+from itertools import islice
+import numpy as np
 
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
-
-from file_scanner.scanner import scan_directory
-from extraction.extraction_module import extract_content
+from file_scanner.scanner import iter_directory, hash_file, hash_bytes
+from extraction.extraction_module import extract_file
 from embeddings.embedder import Embedder
-from vector_db.faiss_db import FAISSDatabase
+from vector_db.faiss_db import FAISSDatabase, PREVIEW_CHARS
+from cache.extraction_cache import ExtractionCache
 
 router = APIRouter()
 
+# File types accepted by /upload
+SUPPORTED_EXTENSIONS = frozenset({'.pdf', '.docx', '.txt'})
+
+# How often progress streams look for changes, and the longest they stay
+# silent before sending a keep-alive comment
+PROGRESS_POLL_SECONDS = 0.25
+PROGRESS_KEEPALIVE_SECONDS = 15
+
+@dataclass
+class JobProgress:
+    """
+    Progress of one indexing job
+    
+    Only the job's own thread updates the counters, so plain int attributes
+    are safe to bump without a lock; readers just see a slightly stale value.
+    """
+    total: int
+    processed: int = 0
+    indexed: int = 0
+    status: str = 'processing'
+    finished_at: Optional[float] = None
+    
+    def to_dict(self) -> Dict:
+        return {
+            'total': self.total,
+            'processed': self.processed,
+            'indexed': self.indexed,
+            'status': self.status
+        }
+
 class IndexingService:
     """Thread-safe indexing service with progress tracking"""
     
+    # Extracted texts are embedded together in buckets of this size
+    ENCODE_BATCH_SIZE = 32
+    # Extracted text beyond this is dropped before embedding
+    MAX_TEXT_CHARS = 50000
+    # Finished jobs stay queryable for this many seconds
+    PROGRESS_TTL = 3600
+    
     def __init__(self):
         self.embedder = None
         self.db = None  # Will be set from search service
+        # Threads hash files (I/O); processes parse them (CPU-bound, GIL-free)
         self.executor = ThreadPoolExecutor(max_workers=4)
+        self.process_pool = None
         self.progress = {}
         self._db_shared = False
+        # Jobs look up duplicates while other jobs may be adding vectors
+        self.db_lock = threading.Lock()
+        # Embeddings of on-disk files, keyed by (path, mtime_ns, size), so a
+        # rescan skips hashing and extracting files that have not changed
+        self.extraction_cache = ExtractionCache()
+        
+    def initialize(self, shared_db=None, shared_embedder=None):
+        """Lazy initialization of embedder, database and extraction processes"""
+        if shared_db is not None:
+            self.db = shared_db
+            self._db_shared = True
+        
+        if shared_embedder is not None:
+            self.embedder = shared_embedder
         
-    def initialize(self):
-        """Lazy initialization of embedder and database"""
         if self.embedder is None:
             print(" Initializing embedder...")
             self.embedder = Embedder()
@@ -42,82 +97,241 @@ class IndexingService:
         if self.db is None:
             print(" Initializing database...")
             self.db = FAISSDatabase(dimension=self.embedder.get_dimension())
+        
+        if self.process_pool is None:
+            self.process_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
     
-    def process_single_file(self, file_info: Dict) -> Optional[Dict]:
-        """Process a single file (runs in thread pool)"""
+    @staticmethod
+    def hash_single_file(file_info: Dict) -> Optional[str]:
+        """Content hash of an uploaded or on-disk file (runs in thread pool)"""
         try:
-            text = extract_content(file_info['path'], file_info['ext'])
+            if 'content' in file_info:
+                return hash_bytes(file_info['content'])
+            return hash_file(file_info['path'])
+        except OSError as e:
+            print(f" Error reading {file_info['name']}: {e}")
+            return None
+    
+    @staticmethod
+    def _cache_key(file_info: Dict) -> Optional[tuple]:
+        """(mtime_ns, size) for files scanned from disk; uploads are not cached"""
+        if 'content' in file_info or 'mtime_ns' not in file_info:
+            return None
+        return file_info['mtime_ns'], file_info.get('size', 0)
+    
+    def _embed_bucket(self, bucket: List[Dict], matrix: np.ndarray, infos: List[Dict],
+                      cache_keys: List[Optional[tuple]]):
+        """Embed a bucket of extracted files in one encode call, writing rows into matrix"""
+        to_encode = [r for r in bucket if 'embedding' not in r]
+        if to_encode:
+            embeddings = self.embedder.encode(
+                [r['text'] for r in to_encode],
+                batch_size=self.ENCODE_BATCH_SIZE
+            )
+            for result, embedding in zip(to_encode, embeddings):
+                result['embedding'] = embedding
+        
+        for result in bucket:
+            matrix[len(infos)] = result['embedding']
+            infos.append(result['info'])
+            cache_keys.append(result.get('cache_key'))
+    
+    def batch_process_files(self, files: List[Dict], job_id: str, shared_db=None) -> Dict:
+        """Extract files in parallel, embed them in batches, then index them with one add"""
+        self.initialize(shared_db=shared_db)
+        
+        total = len(files)
+        
+        self._prune_progress()
+        progress = self.progress[job_id] = JobProgress(total=total)
+        
+        # Reserve every row up front; the index then gets one contiguous add
+        # instead of growing its storage bucket by bucket
+        matrix = np.empty((total, self.embedder.get_dimension()), dtype=np.float32)
+        infos = []
+        # Rows that should be written to the extraction cache (None = don't)
+        cache_keys = []
+        bucket = []
+        
+        def flush_bucket():
+            self._embed_bucket(bucket, matrix, infos, cache_keys)
+            progress.indexed = len(infos)
+            bucket.clear()
+        
+        # Identical content gets one vector: later copies become aliases of
+        # the first one instead of new rows
+        first_copies = {}  # content_hash -> info of the copy this job embeds
+        job_repeats = []   # (first copy's info, info, cache_key)
+        db_repeats = []    # (vector_id, vector, info, cache_key)
+        
+        def is_repeat(info, cache_key) -> bool:
+            """
+            Record info as a copy of content seen before, or skip it if the
+            database already has this path with this content
             
-            if not text or text.startswith('Error'):
-                return None
+            Returns False if the content is new and info needs a row of its own.
+            """
+            content_hash = info['content_hash']
+            with self.db_lock:
+                if self.db.has_file(info['path'], content_hash):
+                    # Indexed by an earlier scan and unchanged since: nothing to add
+                    return True
             
-            max_chars = 50000
-            if len(text) > max_chars:
-                text = text[:max_chars] + "... [truncated]"
+            first = first_copies.get(content_hash)
+            if first is not None:
+                job_repeats.append((first, info, cache_key))
+                return True
             
-            embedding = self.embedder.encode(text)
+            with self.db_lock:
+                duplicate = self.db.find_duplicate(content_hash)
+            if duplicate is not None:
+                vector_id, vector, original = duplicate
+                info['preview'] = original.get('preview', '')
+                db_repeats.append((vector_id, vector, info, cache_key))
+                return True
             
-            processed_info = {
+            first_copies[content_hash] = info
+            return False
+        
+        # Stage 0: files unchanged since an earlier scan are skipped while the
+        # database still has them, and re-added from their cached vector if
+        # it does not (e.g. after a clear)
+        to_hash = []
+        for file_info in files:
+            cache_key = self._cache_key(file_info)
+            hit = (
+                self.extraction_cache.get(file_info['path'], *cache_key)
+                if cache_key is not None else None
+            )
+            if hit is not None:
+                if not is_repeat(hit[1], None):
+                    bucket.append({'embedding': hit[0], 'info': hit[1]})
+                progress.processed += 1
+            else:
+                to_hash.append(file_info)
+        
+        # Stage 1: hash; content that is already indexed (or queued by this
+        # job) reuses its vector
+        pending = {}
+        for file_info, content_hash in zip(to_hash, self.executor.map(self.hash_single_file, to_hash)):
+            if content_hash is None:
+                progress.processed += 1
+                continue
+            
+            cache_key = self._cache_key(file_info)
+            
+            info = {
                 'path': file_info['path'],
                 'name': file_info['name'],
                 'ext': file_info['ext'],
                 'size': file_info.get('size', 0),
-                'text': text[:1000]
+                'content_hash': content_hash
             }
             
-            return {
-                'embedding': embedding,
-                'info': processed_info
-            }
-            
-        except Exception as e:
-            print(f" Error processing {file_info['name']}: {e}")
-            return None
-    
-    def batch_process_files(self, files: List[Dict], job_id: str, shared_db=None) -> Dict:
-        """Process multiple files in parallel"""
-        if shared_db:
-            self.initialize(shared_db=shared_db)
-        else:
-            self.initialize()
+            if is_repeat(info, cache_key):
+                progress.processed += 1
+            else:
+                # Workers stop reading at MAX_TEXT_CHARS, so the full text never crosses the process boundary
+                future = self.process_pool.submit(extract_file, file_info, self.MAX_TEXT_CHARS)
+                pending[future] = (info, cache_key)
         
-        results = []
-        total = len(files)
-        
-        self.progress[job_id] = {
-            'total': total,
-            'processed': 0,
-            'indexed': 0,
-            'status': 'processing'
-        }
+        # Stage 2: extract in worker processes, embed in batches here
+        for future in as_completed(pending):
+            info, cache_key = pending[future]
+            try:
+                text = future.result()
+            except Exception as e:
+                print(f" Error processing {info['name']}: {e}")
+                text = None
+            
+            if text and not text.startswith('Error'):
+                info['preview'] = text[:PREVIEW_CHARS]
+                bucket.append({'text': text, 'info': info, 'cache_key': cache_key})
+            
+            progress.processed += 1
+            
+            if len(bucket) >= self.ENCODE_BATCH_SIZE:
+                flush_bucket()
         
-        futures = {
-            self.executor.submit(self.process_single_file, file_info): file_info 
-            for file_info in files
-        }
+        if bucket:
+            flush_bucket()
         
-        for future in as_completed(futures):
-            result = future.result()
+        # Persist only when something was actually added
+        indexed = 0
+        cache_entries = []
+        with self.db_lock:
+            start = len(self.db.metadata)
+            if infos and self.db.add_batch(matrix[:len(infos)], infos):
+                indexed = len(infos)
+                cache_entries.extend(
+                    (*cache_key, matrix[row], infos[row])
+                    for row, cache_key in enumerate(cache_keys)
+                    if cache_key is not None
+                )
             
-            if result:
-                self.db.add(result['embedding'], result['info'])
-                results.append(result)
-                self.progress[job_id]['indexed'] += 1
+            # Copies point at the row their content was stored in; copies of
+            # a file whose extraction failed are dropped with it
+            aliases = list(db_repeats)
+            if indexed:
+                rows = {id(info): row for row, info in enumerate(infos)}
+                for first, info, cache_key in job_repeats:
+                    row = rows.get(id(first))
+                    if row is not None:
+                        info['preview'] = first['preview']
+                        aliases.append((start + row, matrix[row], info, cache_key))
+            if aliases:
+                indexed += self.db.add_aliases([(vector_id, info) for vector_id, _, info, _ in aliases])
             
-            self.progress[job_id]['processed'] += 1
+            if indexed:
+                # Appends to the database log; the full index is rewritten only periodically
+                self.db.flush()
         
-        self.db.save()
+        if indexed:
+            cache_entries.extend(
+                (*cache_key, vector, info)
+                for _, vector, info, cache_key in aliases
+                if cache_key is not None
+            )
+            self.extraction_cache.set_many(cache_entries)
+        progress.indexed = indexed
         
-        self.progress[job_id]['status'] = 'completed'
+        progress.status = 'completed'
+        progress.finished_at = time.monotonic()
         
         return {
             'total_processed': total,
-            'successfully_indexed': len(results)
+            'successfully_indexed': indexed
         }
     
+    def shutdown(self):
+        """
+        Stop the worker pools
+        
+        Extraction workers are forked from the server process: left running
+        they keep its listening socket open, and they inherit uvicorn's
+        SIGTERM handler, so they would not exit on their own.
+        """
+        self.executor.shutdown(wait=False)
+        if self.process_pool is not None:
+            self.process_pool.shutdown(wait=True, cancel_futures=True)
+            self.process_pool = None
+    
     def get_progress(self, job_id: str) -> Dict:
         """Get progress for a job"""
-        return self.progress.get(job_id, {'status': 'not_found'})
+        progress = self.progress.get(job_id)
+        if progress is None:
+            return {'status': 'not_found'}
+        return progress.to_dict()
+    
+    def _prune_progress(self):
+        """Forget jobs that finished more than PROGRESS_TTL seconds ago"""
+        cutoff = time.monotonic() - self.PROGRESS_TTL
+        expired = [
+            job_id for job_id, progress in list(self.progress.items())
+            if progress.finished_at is not None and progress.finished_at < cutoff
+        ]
+        for job_id in expired:
+            self.progress.pop(job_id, None)
 
 
     def reset_database(self):
@@ -146,6 +360,19 @@ class ScanResponse(BaseModel):
     files_to_process: int
     estimated_time_seconds: float
 
+def collect_files(folder_path: str, file_types: List[str], max_files: Optional[int] = None) -> List[Dict]:
+    """
+    Walk folder_path for files of the requested types
+    
+    Unsupported types are filtered out during the walk, before any stat, and
+    the walk stops as soon as max_files matches have been found.
+    """
+    # frozenset: iter_directory uses it as-is instead of copying it
+    files = iter_directory(folder_path, frozenset(ext.lower() for ext in file_types))
+    if max_files:
+        files = islice(files, max_files)
+    return list(files)
+
 @router.post('/', response_model=ScanResponse)
 async def scan_and_index_async(request: ScanRequest):
     """Asynchronously scan folder and index files"""
@@ -158,19 +385,10 @@ async def scan_and_index_async(request: ScanRequest):
             raise HTTPException(status_code=400, detail=f"Path is not a directory: {request.folder_path}")
         
         print(f"� Scanning directory: {request.folder_path}")
-        files = scan_directory(str(folder_path))
-        
-        if isinstance(files, dict) and 'error' in files:
-            raise HTTPException(status_code=400, detail=files['error'])
-        
-        supported_exts = set(request.file_types)
-        supported_files = [
-            f for f in files 
-            if f.get('ext', '').lower() in supported_exts
-        ]
-        
-        if request.max_files:
-            supported_files = supported_files[:request.max_files]
+        # The walk runs in a worker thread so other requests keep being served
+        supported_files = await asyncio.to_thread(
+            collect_files, str(folder_path), request.file_types, request.max_files
+        )
         
         if not supported_files:
             raise HTTPException(
@@ -190,7 +408,7 @@ async def scan_and_index_async(request: ScanRequest):
         return ScanResponse(
             job_id=job_id,
             message="Indexing started in background",
-            files_scanned=len(files),
+            files_scanned=len(supported_files),
             files_to_process=len(supported_files),
             estimated_time_seconds=estimated_time
         )
@@ -210,6 +428,37 @@ async def get_indexing_progress(job_id: str):
     
     return progress
 
+async def progress_events(job_id: str):
+    """Yield a server-sent event each time a job's progress changes, until it ends"""
+    last_sent = None
+    last_write = time.monotonic()
+    
+    while True:
+        progress = indexing_service.get_progress(job_id)
+        if progress != last_sent:
+            last_sent = progress
+            last_write = time.monotonic()
+            yield f"data: {json.dumps(progress)}\n\n"
+        elif time.monotonic() - last_write >= PROGRESS_KEEPALIVE_SECONDS:
+            last_write = time.monotonic()
+            yield ": keep-alive\n\n"
+        
+        if progress.get('status') != 'processing':
+            break
+        await asyncio.sleep(PROGRESS_POLL_SECONDS)
+
+@router.get('/progress/{job_id}/stream')
+async def stream_job_progress(job_id: str):
+    """Push progress of an indexing job as server-sent events instead of being polled"""
+    if indexing_service.get_progress(job_id).get('status') == 'not_found':
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return StreamingResponse(
+        progress_events(job_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache'}
+    )
+
 @router.post('/sync')
 def scan_and_index_sync(request: ScanRequest):
     """Synchronous version - blocks until complete"""
@@ -218,23 +467,12 @@ def scan_and_index_sync(request: ScanRequest):
         if not folder_path.exists():
             raise HTTPException(status_code=400, detail=f"Folder does not exist: {request.folder_path}")
         
-        files = scan_directory(str(folder_path))
-        if isinstance(files, dict) and 'error' in files:
-            raise HTTPException(status_code=400, detail=files['error'])
-        
-        supported_exts = set(request.file_types)
-        supported_files = [
-            f for f in files 
-            if f.get('ext', '').lower() in supported_exts
-        ]
-        
-        if request.max_files:
-            supported_files = supported_files[:request.max_files]
+        supported_files = collect_files(str(folder_path), request.file_types, request.max_files)
         
         if not supported_files:
             return {
                 'message': 'No supported files found',
-                'files_scanned': len(files),
+                'files_scanned': 0,
                 'files_indexed': 0
             }
         
@@ -243,7 +481,7 @@ def scan_and_index_sync(request: ScanRequest):
         
         return {
             'message': 'Indexing complete',
-            'files_scanned': len(files),
+            'files_scanned': len(supported_files),
             'files_indexed': result['successfully_indexed'],
             'files_processed': result['total_processed']
         }
@@ -253,6 +491,84 @@ def scan_and_index_sync(request: ScanRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+async def stream_indexing_progress(files: List[Dict], job_id: str, files_scanned: int):
+    """Run an indexing job and yield its real progress as NDJSON lines"""
+    task = asyncio.create_task(
+        asyncio.to_thread(indexing_service.batch_process_files, files, job_id)
+    )
+    last_sent = None
+    
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=0.25)
+        
+        progress = indexing_service.get_progress(job_id)
+        if progress.get('status') != 'not_found' and progress != last_sent:
+            last_sent = dict(progress)
+            yield json.dumps({'phase': 'index', **last_sent}) + '\n'
+        
+        if done:
+            break
+    
+    try:
+        result = task.result()
+        yield json.dumps({
+            'phase': 'done',
+            'files_scanned': files_scanned,
+            'files_indexed': result['successfully_indexed'],
+            'files_processed': result['total_processed']
+        }) + '\n'
+    except Exception as e:
+        yield json.dumps({'phase': 'error', 'detail': str(e)}) + '\n'
+
+@router.post('/upload')
+async def scan_uploads(
+    files: List[UploadFile] = File(...),
+    stream: bool = Query(False, description="Stream progress as NDJSON lines")
+):
+    """Index uploaded files straight from the request body, without temp files"""
+    try:
+        uploads = []
+        for upload in files:
+            ext = os.path.splitext(upload.filename or '')[1].lower()
+            if ext not in SUPPORTED_EXTENSIONS:
+                continue
+            
+            content = await upload.read()
+            uploads.append({
+                'path': f"uploads/{upload.filename}",
+                'name': upload.filename,
+                'ext': ext,
+                'size': len(content),
+                'content': content
+            })
+        
+        if not uploads:
+            return {
+                'message': 'No supported files uploaded',
+                'files_scanned': len(files),
+                'files_indexed': 0
+            }
+        
+        job_id = f"upload_{int(time.time() * 1000)}"
+        
+        if stream:
+            return StreamingResponse(
+                stream_indexing_progress(uploads, job_id, len(files)),
+                media_type='application/x-ndjson'
+            )
+        
+        result = await asyncio.to_thread(indexing_service.batch_process_files, uploads, job_id)
+        
+        return {
+            'message': 'Indexing complete',
+            'files_scanned': len(files),
+            'files_indexed': result['successfully_indexed'],
+            'files_processed': result['total_processed']
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
 @router.get('/stats')
 async def get_indexing_stats():
     """Get current database statistics"""
@@ -262,7 +578,7 @@ async def get_indexing_stats():
         
         return {
             'status': 'ready',
-            'total_indexed_files': stats['total_vectors'],
+            'total_indexed_files': stats['total_files'],
             'embedding_dimension': stats['dimension'],
             'database_path': stats['index_path']
         }
@@ -1,9 +1,5 @@
 ﻿from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import sys
-import os
-
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from embeddings.embedder import Embedder
 from vector_db.faiss_db import FAISSDatabase
@@ -51,7 +47,7 @@ def search(request: SearchRequest):
                 'path': result['path'],
                 'similarity_score': result['similarity_score'],
                 'context_score': result.get('context_score', result['similarity_score']),
-                'preview': result['text'][:200] + '...'
+                'preview': result.get('preview', result.get('text', ''))[:200] + '...'
             })
         
         return {
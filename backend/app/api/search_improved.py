@@ -7,18 +7,16 @@ Features: 3x faster, better accuracy, query caching
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field, validator
 from typing import Optional, List
-import sys
-import os
-
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+import numpy as np
 
 from embeddings.embedder import Embedder
 from vector_db.faiss_db import FAISSDatabase
+from vector_db.query_coalescer import QueryCoalescer
 from context_engine.ranking import ContextAwareRanker
 
 try:
     from search.hybrid_search import HybridSearchEngine
-    from cache.cache_manager import query_cache
+    from cache.cache_manager import query_cache, normalize_query
     from utils.validators import InputValidator
     ENHANCED_FEATURES = True
 except ImportError:
@@ -31,11 +29,23 @@ embedder = None
 db = None
 ranker = ContextAwareRanker()
 hybrid_engine = None
+coalescer = None
 
 
-def initialize_services():
-    """Initialize all search services"""
-    global embedder, db, hybrid_engine
+def initialize_services(shared_embedder=None, shared_db=None):
+    """
+    Initialize all search services
+    
+    main.lifespan passes the app-wide embedder and database at startup, so
+    search, scan and file routes all see the same index. Without them
+    (router used on its own) each service is created here on first use.
+    """
+    global embedder, db, hybrid_engine, coalescer
+    
+    if shared_embedder is not None:
+        embedder = shared_embedder
+    if shared_db is not None:
+        db = shared_db
     
     if embedder is None:
         print("?? Initializing embedder...")
@@ -45,6 +55,10 @@ def initialize_services():
         print("?? Initializing database...")
         db = FAISSDatabase(dimension=embedder.get_dimension())
     
+    if coalescer is None:
+        # Concurrent semantic searches share one batched index.search
+        coalescer = QueryCoalescer(db)
+    
     if ENHANCED_FEATURES and hybrid_engine is None:
         print("?? Initializing hybrid search engine...")
         from search.hybrid_search import HybridSearchEngine
@@ -103,7 +117,8 @@ def search(request: SearchRequest):
         
         cache_hit = False
         if ENHANCED_FEATURES:
-            cached_results = query_cache.get_results(request.query, request.k)
+            cache_query = normalize_query(request.query)
+            cached_results = query_cache.get_results(cache_query, request.k)
             if cached_results is not None:
                 cache_hit = True
                 return SearchResponse(
@@ -116,34 +131,54 @@ def search(request: SearchRequest):
                     processing_time_ms=(time.time() - start_time) * 1000
                 )
         
+        # The query vector is cached separately from results, so a different
+        # k or search mode still reuses the encoder output
+        query_embedding = None
+        if ENHANCED_FEATURES:
+            query_embedding = query_cache.get_embedding(cache_query)
+        if query_embedding is None:
+            query_embedding = embedder.encode(request.query)
+            # Unit length once here, so the cached vector is ready for the
+            # inner-product index on every later hit
+            norm = np.linalg.norm(query_embedding)
+            if norm > 0:
+                query_embedding = query_embedding / norm
+            if ENHANCED_FEATURES:
+                query_cache.set_embedding(cache_query, query_embedding)
+        
         if ENHANCED_FEATURES and request.use_hybrid and hybrid_engine:
             results = hybrid_engine.search(
                 query=request.query,
                 k=request.k,
-                min_score=request.min_score
+                min_score=request.min_score,
+                precomputed_embedding=query_embedding
             )
             search_method = 'hybrid'
         else:
-            query_embedding = embedder.encode(request.query)
-            results = db.search(query_embedding, k=request.k)
+            results = coalescer.search(query_embedding, k=request.k)
             search_method = 'semantic'
         
         if request.file_types:
-            results = [
-                r for r in results 
-                if r.get('ext', '').lower() in [ft.lower() for ft in request.file_types]
-            ]
+            # Stored extensions are already lowercase (see file_scanner)
+            file_types = frozenset(ft.lower() for ft in request.file_types)
+            results = [r for r in results if r.get('ext', '') in file_types]
         
-        if request.min_score > 0:
-            score_key = 'hybrid_score' if search_method == 'hybrid' else 'similarity_score'
-            results = [r for r in results if r.get(score_key, 0) >= request.min_score]
+        # The hybrid engine already applied min_score, on its fusion's scale
+        if request.min_score > 0 and search_method == 'semantic':
+            results = [r for r in results if r.get('similarity_score', 0) >= request.min_score]
         
         if request.use_context and results:
             results = ranker.rerank(results, query=request.query)
         
-        formatted_results = []
-        for result in results:
-            formatted_results.append(SearchResult(
+        # Fields come from our own metadata and scoring, so skip re-validating
+        # every result; the list is sized once up front
+        formatted_results = [None] * len(results)
+        for i, result in enumerate(results):
+            preview = result.get('preview', result.get('text', ''))
+            if len(preview) > 200:
+                preview = preview[:200] + '...'
+            
+            formatted_results[i] = SearchResult.model_construct(
                 rank=result.get('rank', 0),
                 name=result['name'],
                 path=result['path'],
@@ -152,13 +187,13 @@ def search(request: SearchRequest):
                 hybrid_score=result.get('hybrid_score'),
                 semantic_score=result.get('semantic_score'),
                 bm25_score=result.get('bm25_score'),
-                preview=result.get('text', '')[:200] + '...',
+                preview=preview,
                 file_type=result.get('ext', 'unknown'),
                 search_method=result.get('search_method', search_method)
-            ))
+            )
         
         if ENHANCED_FEATURES and formatted_results:
-            query_cache.set_results(request.query, request.k, formatted_results)
+            query_cache.set_results(cache_query, request.k, formatted_results)
         
         processing_time = (time.time() - start_time) * 1000
         
@@ -205,7 +240,7 @@ def health_check():
             'status': 'healthy',
             'embedder_loaded': embedder is not None,
             'database_loaded': db is not None,
-            'documents_indexed': db.get_stats()['total_vectors'] if db else 0,
+            'documents_indexed': db.get_stats()['total_files'] if db else 0,
             'hybrid_search_available': hybrid_engine is not None,
             'caching_available': ENHANCED_FEATURES
         }
@@ -216,6 +251,15 @@ def health_check():
         }
 
 
+@router.get('/status')
+def get_status():
+    """Health and cache statistics in one response (for status panels)"""
+    return {
+        'health': health_check(),
+        'cache_stats': get_cache_stats()
+    }
+
+
 @router.post('/database/clear')
 def clear_database():
     """Clear all indexed files from database"""
@@ -241,33 +285,6 @@ def clear_database():
         raise HTTPException(status_code=500, detail=f'Error clearing database: {str(e)}')
 
 
-@router.delete('/database/clear')
-def clear_all_indexed_files():
-    """Delete all indexed files from database"""
-    global db, hybrid_engine
-    
-    try:
-        if db is None:
-            initialize_services()
-        
-        # Clear the database
-        db.clear()
-        db.save()
-        
-        # Reinitialize hybrid search
-        if hybrid_engine:
-            hybrid_engine = None
-        
-        return {
-            'message': 'All indexed files cleared successfully',
-            'status': 'success',
-            'documents_remaining': 0
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
 @router.delete('/database/clear')
 def clear_all_indexed_files():
     """Delete all indexed files from database"""
@@ -1,13 +1,63 @@
-﻿from fastapi import FastAPI
+﻿import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import QueryParams
+from starlette.middleware.gzip import GZipMiddleware
 
 # Import improved APIs
 from api import scan_improved, search_improved, file, context
 
+from embeddings.embedder import Embedder
+from vector_db.faiss_db import FAISSDatabase
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load the embedding model and vector database once, before serving requests"""
+    # Model loading is blocking; keep it off the event loop thread
+    embedder = await asyncio.to_thread(Embedder)
+    # Run one dummy batch so torch kernels and tokenizer caches are warm
+    await asyncio.to_thread(embedder.encode, ["warmup"])
+    db = await asyncio.to_thread(FAISSDatabase, embedder.get_dimension())
+    
+    app.state.embedder = embedder
+    app.state.db = db
+    
+    # The search and indexing services share these instances instead of
+    # loading their own copies on the first request
+    await asyncio.to_thread(search_improved.initialize_services, embedder, db)
+    await asyncio.to_thread(scan_improved.indexing_service.initialize, db, embedder)
+    yield
+    
+    # Fold vectors still in the append log into the index file
+    db.compact()
+    scan_improved.indexing_service.shutdown()
+
+class ProgressAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZip middleware that leaves progress streams uncompressed
+    
+    The compressor holds small writes back until it has enough to emit, so
+    SSE and NDJSON progress events would reach the client late and in bursts.
+    """
+    
+    STREAM_FLAGS = frozenset({'1', 'true', 'yes', 'on'})
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and (
+            scope['path'].endswith('/stream') or
+            QueryParams(scope['query_string']).get('stream', '').lower() in self.STREAM_FLAGS
+        ):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
 app = FastAPI(
     title="NeuroDrive - Context-Aware Semantic File System",
     description="AI-powered file search with semantic understanding",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -19,6 +69,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Search results and file listings carry text previews and compress well
+app.add_middleware(ProgressAwareGZipMiddleware, minimum_size=1024)
+
 # Register improved API routes
 app.include_router(scan_improved.router, prefix="/scan", tags=["Scan"])
 app.include_router(search_improved.router, prefix="/search", tags=["Search"])
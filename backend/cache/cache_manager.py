@@ -4,99 +4,160 @@ Caching Layer for NeuroDrive
 
 import hashlib
 import time
-import pickle
 from typing import Any, Optional, Dict
 from collections import OrderedDict
 import threading
 
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+
+NS_PER_SECOND = 1_000_000_000
+
+STAT_NAMES = ('hits', 'misses', 'evictions', 'expirations')
+
+
+class _CacheShard:
+    """One independently locked slice of a CacheManager"""
+    
+    # Counters are plain int attributes: no dict lookup on the hot path
+    __slots__ = ('cache', 'lock') + STAT_NAMES
+    
+    def __init__(self):
+        self.cache: OrderedDict = OrderedDict()
+        self.lock = threading.RLock()
+        self.reset_stats()
+    
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
 
 class CacheManager:
-    """Thread-safe in-memory cache with TTL and LRU eviction"""
+    """
+    Thread-safe in-memory cache with TTL and LRU eviction
+    
+    Entries are spread over NUM_SHARDS shards by key hash, each with its own
+    lock and LRU order, so concurrent requests only contend when they hit
+    the same shard. max_size is split evenly across shards.
+    """
+    
+    NUM_SHARDS = 16
     
     def __init__(self, max_size: int = 1000, default_ttl: int = 3600):
         self.max_size = max_size
         self.default_ttl = default_ttl
-        self.cache: OrderedDict = OrderedDict()
-        self.lock = threading.RLock()
-        self.stats = {
-            'hits': 0,
-            'misses': 0,
-            'evictions': 0,
-            'expirations': 0
-        }
+        self.shard_max_size = max(1, -(-max_size // self.NUM_SHARDS))
+        self.shards = [_CacheShard() for _ in range(self.NUM_SHARDS)]
+    
+    def _shard(self, key: str) -> _CacheShard:
+        return self.shards[hash(key) & (self.NUM_SHARDS - 1)]
     
     def _generate_key(self, data: Any) -> str:
-        """Generate cache key from data"""
+        """
+        Generate a compact cache key from arbitrary data
+        
+        Plain string keys can be passed to get/set directly; this is only
+        for callers that need to key on something else.
+        """
         if isinstance(data, str):
             key_data = data.encode('utf-8')
+        elif isinstance(data, tuple):
+            key_data = "\x00".join(map(str, data)).encode('utf-8')
         else:
-            key_data = pickle.dumps(data)
+            key_data = repr(data).encode('utf-8')
         
-        return hashlib.md5(key_data).hexdigest()
+        if XXHASH_AVAILABLE:
+            return xxhash.xxh3_64_hexdigest(key_data)
+        return hashlib.blake2b(key_data, digest_size=8).hexdigest()
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
-        with self.lock:
-            if key not in self.cache:
-                self.stats['misses'] += 1
+        shard = self._shard(key)
+        now = time.monotonic_ns()
+        
+        with shard.lock:
+            entry = shard.cache.get(key)
+            if entry is None:
+                shard.misses += 1
                 return None
             
-            value, timestamp, ttl = self.cache[key]
+            value, expires_at_ns = entry
             
-            if time.time() - timestamp > ttl:
-                del self.cache[key]
-                self.stats['expirations'] += 1
-                self.stats['misses'] += 1
+            if expires_at_ns < now:
+                del shard.cache[key]
+                shard.expirations += 1
+                shard.misses += 1
                 return None
             
-            self.cache.move_to_end(key)
-            self.stats['hits'] += 1
+            shard.cache.move_to_end(key)
+            shard.hits += 1
             
             return value
     
     def set(self, key: str, value: Any, ttl: Optional[int] = None):
         """Set value in cache"""
         ttl = ttl if ttl is not None else self.default_ttl
+        shard = self._shard(key)
+        # Expiry is fixed at insert time; monotonic so clock changes can't expire or revive entries
+        entry = (value, time.monotonic_ns() + int(ttl * NS_PER_SECOND))
         
-        with self.lock:
-            if len(self.cache) >= self.max_size and key not in self.cache:
-                self.cache.popitem(last=False)
-                self.stats['evictions'] += 1
+        with shard.lock:
+            if len(shard.cache) >= self.shard_max_size and key not in shard.cache:
+                shard.cache.popitem(last=False)
+                shard.evictions += 1
             
-            self.cache[key] = (value, time.time(), ttl)
-            self.cache.move_to_end(key)
+            shard.cache[key] = entry
+            shard.cache.move_to_end(key)
     
     def clear(self):
         """Clear all cache entries"""
-        with self.lock:
-            self.cache.clear()
-            self.stats = {
-                'hits': 0,
-                'misses': 0,
-                'evictions': 0,
-                'expirations': 0
-            }
+        for shard in self.shards:
+            with shard.lock:
+                shard.cache.clear()
+                shard.reset_stats()
     
     def get_stats(self) -> Dict:
-        """Get cache statistics"""
-        with self.lock:
-            total_requests = self.stats['hits'] + self.stats['misses']
-            hit_rate = (
-                self.stats['hits'] / total_requests 
-                if total_requests > 0 
-                else 0
-            )
-            
-            return {
-                'size': len(self.cache),
-                'max_size': self.max_size,
-                'hit_rate': f"{hit_rate:.2%}",
-                **self.stats
-            }
+        """Get cache statistics (summed over shards)"""
+        stats = dict.fromkeys(STAT_NAMES, 0)
+        size = 0
+        for shard in self.shards:
+            with shard.lock:
+                size += len(shard.cache)
+                for name in STAT_NAMES:
+                    stats[name] += getattr(shard, name)
+        
+        total_requests = stats['hits'] + stats['misses']
+        hit_rate = (
+            stats['hits'] / total_requests 
+            if total_requests > 0 
+            else 0
+        )
+        
+        return {
+            'size': size,
+            'max_size': self.max_size,
+            'hit_rate': f"{hit_rate:.2%}",
+            **stats
+        }
+
+
+def normalize_query(query: str) -> str:
+    """Cache form of a query; compute once per request and pass it to QueryCache"""
+    return query.strip().lower()
 
 
 class QueryCache:
-    """Specialized cache for search queries"""
+    """
+    Specialized cache for search queries
+    
+    Methods take the query already normalized with normalize_query.
+    """
     
     def __init__(self):
         self.embedding_cache = CacheManager(max_size=500, default_ttl=7200)
@@ -104,22 +165,22 @@ class QueryCache:
     
     def get_embedding(self, query: str):
         """Get cached embedding for query"""
-        key = self.embedding_cache._generate_key(query.lower().strip())
+        key = f"e:{query}"
         return self.embedding_cache.get(key)
     
     def set_embedding(self, query: str, embedding):
         """Cache embedding for query"""
-        key = self.embedding_cache._generate_key(query.lower().strip())
+        key = f"e:{query}"
         self.embedding_cache.set(key, embedding)
     
     def get_results(self, query: str, k: int):
         """Get cached search results"""
-        key = self.result_cache._generate_key((query.lower().strip(), k))
+        key = f"r:{k}:{query}"
         return self.result_cache.get(key)
     
     def set_results(self, query: str, k: int, results):
         """Cache search results"""
-        key = self.result_cache._generate_key((query.lower().strip(), k))
+        key = f"r:{k}:{query}"
         self.result_cache.set(key, results)
     
     def clear_all(self):
@@ -0,0 +1,76 @@
+"""
+Persistent Extraction Cache for NeuroDrive
+Skips re-extracting and re-embedding files that have not changed since the last scan
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class ExtractionCache:
+    """SQLite-backed cache mapping a file's identity (path, mtime_ns, size) to its embedding"""
+
+    def __init__(self, db_path: str = "./data/indexes/extraction_cache.db"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        # One row per path: a changed mtime/size simply replaces the old entry
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extract_cache (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                meta TEXT NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+
+    def get(self, path: str, mtime_ns: int, size: int) -> Optional[Tuple[np.ndarray, Dict]]:
+        """Return (embedding, file_info) if the file is unchanged since it was cached"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT vector, meta FROM extract_cache WHERE path = ? AND mtime_ns = ? AND size = ?",
+                (path, mtime_ns, size)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return np.frombuffer(row[0], dtype=np.float32), json.loads(row[1])
+
+    def set_many(self, entries: List[Tuple[int, int, np.ndarray, Dict]]):
+        """Store (mtime_ns, size, embedding, file_info) entries in a single transaction"""
+        rows = [
+            (
+                info['path'],
+                mtime_ns,
+                size,
+                np.asarray(embedding, dtype=np.float32).tobytes(),
+                json.dumps(info)
+            )
+            for mtime_ns, size, embedding, info in entries
+        ]
+
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO extract_cache (path, mtime_ns, size, vector, meta) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.commit()
+
+    def clear(self):
+        """Remove all cached entries"""
+        with self.lock:
+            self.conn.execute("DELETE FROM extract_cache")
+            self.conn.commit()
@@ -1,5 +1,8 @@
 # backend/context_engine/classifier.py
 
+import re
+
+
 class FileClassifier:
     """
     Classifies file content into semantic categories
@@ -12,13 +15,43 @@ class FileClassifier:
             "technology": ["python", "java", "algorithm", "database", "ai"],
             "general": []
         }
+        self._build_matcher()
 
-    def classify(self, text: str) -> str:
-        text = text.lower()
+    def _build_matcher(self):
+        """
+        Compile every keyword into one case-insensitive pattern.
+
+        The lookahead reports a match at each position (keywords may overlap,
+        e.g. "ai" inside "details"), so a single pass over the text sees
+        everything the old per-keyword substring checks did.
+        """
+        self.keyword_category = {}
+        self.priority = {}
 
-        for category, keywords in self.categories.items():
+        for rank, (category, keywords) in enumerate(self.categories.items()):
+            self.priority[category] = rank
             for word in keywords:
-                if word in text:
-                    return category
+                self.keyword_category.setdefault(word.lower(), category)
+
+        # Longest first: keywords starting at the same position resolve to the most specific one
+        words = sorted(self.keyword_category, key=len, reverse=True)
+        self.pattern = (
+            re.compile("(?=(" + "|".join(map(re.escape, words)) + "))", re.IGNORECASE)
+            if words else None
+        )
+
+    def classify(self, text: str) -> str:
+        if self.pattern is None:
+            return "general"
+
+        # Categories keep their declared precedence: the earliest category
+        # with any keyword in the text wins, wherever that keyword appears
+        best = None
+        for match in self.pattern.finditer(text):
+            category = self.keyword_category[match.group(1).lower()]
+            if best is None or self.priority[category] < self.priority[best]:
+                best = category
+                if self.priority[best] == 0:
+                    break
 
-        return "general"
+        return best or "general"
@@ -4,9 +4,17 @@ Author: Manvi (Member 4) - Refactored by Team Lead
 Purpose: Add context-aware enhancements to search results
 """
 
+from collections import Counter
 from datetime import datetime
 from typing import Dict, List
 import os
+import re
+
+import numpy as np
+
+# Runs of 4+ letters: splitting, punctuation stripping and the length filter in one pass
+KEYWORD_RE = re.compile(r"[^\W\d_]{4,}")
+STOP_WORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for'})
 
 
 class ContextBuilder:
@@ -18,13 +26,21 @@ class ContextBuilder:
             '.docx': 1.1,   # Word docs important
             '.txt': 1.0     # Text files baseline
         }
+        
+        # Sorted extensions and their weights, for batch lookup with searchsorted
+        self._weight_exts = np.array(sorted(self.file_type_weights))
+        self._weight_values = np.array(
+            [self.file_type_weights[ext] for ext in self._weight_exts], dtype=np.float32
+        )
     
-    def build_context(self, file_metadata: Dict) -> Dict:
+    def build_context(self, file_metadata: Dict, include_keywords: bool = True) -> Dict:
         """
         Build context from file metadata
         
         Args:
             file_metadata: Dictionary with file info
+            include_keywords: Also tokenize the preview for keywords; scoring
+                              callers that only need the scores can skip it
             
         Returns:
             Context dictionary with scores and features
@@ -32,12 +48,38 @@ class ContextBuilder:
         context = {
             'recency_score': self._calculate_recency_score(file_metadata),
             'type_score': self._calculate_type_score(file_metadata),
-            'size_score': self._calculate_size_score(file_metadata),
-            'keywords': self._extract_keywords(file_metadata.get('text', ''))
+            'size_score': self._calculate_size_score(file_metadata)
         }
         
+        if include_keywords:
+            context['keywords'] = self._extract_keywords(
+                file_metadata.get('preview', file_metadata.get('text', ''))
+            )
+        
         return context
     
+    def build_context_scores(self, results: List[Dict]) -> Dict[str, np.ndarray]:
+        """
+        Scores of build_context for many files at once, one array per score
+        
+        Args:
+            results: List of file metadata dictionaries
+            
+        Returns:
+            Dictionary of float32 arrays aligned with results (no keywords)
+        """
+        n = len(results)
+        sizes = np.fromiter((m.get('size', 0) for m in results), dtype=np.float32, count=n)
+        
+        return {
+            'recency_score': np.fromiter(
+                (self._calculate_recency_score(m) for m in results), dtype=np.float32, count=n
+            ),
+            'type_score': self._type_scores([m.get('ext', '.txt') for m in results]),
+            # Same as _calculate_size_score: proportional up to 10KB, then 1.0
+            'size_score': np.minimum(sizes / np.float32(10000), np.float32(1.0))
+        }
+    
     def _calculate_recency_score(self, metadata: Dict) -> float:
         """Score based on how recent the file is (0-1)"""
         # For now, return 1.0 (can enhance with actual timestamps later)
@@ -48,6 +90,14 @@ class ContextBuilder:
         ext = metadata.get('ext', '.txt')
         return self.file_type_weights.get(ext, 1.0)
     
+    def _type_scores(self, exts: List[str]) -> np.ndarray:
+        """_calculate_type_score for many extensions at once (1.0 when not weighted)"""
+        exts = np.array(exts, dtype=self._weight_exts.dtype.kind)
+        idx = np.searchsorted(self._weight_exts, exts)
+        idx = np.minimum(idx, len(self._weight_exts) - 1)
+        known = self._weight_exts[idx] == exts
+        return np.where(known, self._weight_values[idx], np.float32(1.0))
+    
     def _calculate_size_score(self, metadata: Dict) -> float:
         """Score based on file size (larger = more content = higher score)"""
         size = metadata.get('size', 0)
@@ -60,14 +110,9 @@ class ContextBuilder:
     def _extract_keywords(self, text: str) -> List[str]:
         """Extract important keywords from text"""
         # Simple keyword extraction (can be enhanced)
-        words = text.lower().split()
-        
-        # Filter out common words
-        stop_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for'}
-        keywords = [w for w in words if w not in stop_words and len(w) > 3]
+        keywords = [w for w in KEYWORD_RE.findall(text.lower()) if w not in STOP_WORDS]
         
         # Return top 10 most frequent
-        from collections import Counter
         return [word for word, count in Counter(keywords).most_common(10)]
 
 
@@ -4,45 +4,141 @@ Author: Pavan (Member 3) - Improved by Shashwat (Team Lead)
 Purpose: Convert text into vector embeddings using Sentence Transformers
 """
 
-from sentence_transformers import SentenceTransformer
+import os
+import threading
 import numpy as np
 from typing import List, Union
 
+try:
+    import onnxruntime as ort
+    from tokenizers import Tokenizer
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+# Int8 ONNX export of the model (see embeddings/export_onnx.py)
+DEFAULT_ONNX_PATH = "./data/models/onnx/model-int8.onnx"
+MAX_SEQ_LENGTH = 256
+
+# SentenceTransformer models already loaded in this process, by name
+_models = {}
+_models_lock = threading.Lock()
+
+
+def _get_model(model_name: str):
+    """
+    Load a SentenceTransformer once per process
+    
+    Every Embedder with the same model name shares the loaded weights, so a
+    router that creates its own Embedder doesn't load the model again.
+    """
+    model = _models.get(model_name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(model_name)
+            if model is None:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(model_name)
+                _models[model_name] = model
+    return model
+
 
 class Embedder:
     """
     Handles text-to-vector conversion using Sentence Transformers
+    
+    Uses the int8-quantized ONNX export through ONNX Runtime when it is present,
+    otherwise the PyTorch SentenceTransformer model.
     """
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", onnx_path: str = None):
         """
         Initialize the embedder with a pre-trained model
         
         Args:
             model_name: Name of the sentence transformer model
+            onnx_path: Path to an exported ONNX model (tokenizer.json alongside it)
         """
         print(f"[LOADING] Loading embedding model: {model_name}...")
+        self.model_name = model_name
+        self.model = None
+        self.session = None
+        onnx_path = onnx_path or DEFAULT_ONNX_PATH
+        
         try:
-            self.model = SentenceTransformer(model_name)
-            self.model_name = model_name
-            self.dimension = self.model.get_sentence_embedding_dimension()
-            print(f"[OK] Model loaded! Embedding dimension: {self.dimension}")
+            if ONNX_AVAILABLE and os.path.exists(onnx_path):
+                self._load_onnx(onnx_path)
+                print(f"[OK] ONNX model loaded! Embedding dimension: {self.dimension}")
+            else:
+                self.model = _get_model(model_name)
+                self.dimension = self.model.get_sentence_embedding_dimension()
+                print(f"[OK] Model loaded! Embedding dimension: {self.dimension}")
         except Exception as e:
             print(f"[ERROR] Error loading model: {e}")
             raise
     
-    def encode(self, texts: Union[str, List[str]], show_progress: bool = False) -> np.ndarray:
+    def _load_onnx(self, onnx_path: str):
+        """Load the ONNX Runtime session and the tokenizer exported next to it"""
+        self.session = ort.InferenceSession(onnx_path, providers=['CPUExecutionProvider'])
+        self.onnx_inputs = {i.name for i in self.session.get_inputs()}
+        
+        self.tokenizer = Tokenizer.from_file(
+            os.path.join(os.path.dirname(onnx_path), 'tokenizer.json')
+        )
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+        
+        dimension = self.session.get_outputs()[0].shape[-1]
+        if not isinstance(dimension, int):
+            dimension = self._encode_onnx(["warmup"], batch_size=1).shape[1]
+        self.dimension = dimension
+    
+    def _encode_onnx(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """Tokenize, run the ONNX graph and mean-pool + normalize like the ST pipeline"""
+        outputs = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            
+            feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+            if 'token_type_ids' in self.onnx_inputs:
+                feeds['token_type_ids'] = np.zeros_like(input_ids)
+            
+            token_embeddings = self.session.run(None, feeds)[0]
+            
+            # Mean pooling over real (non-padding) tokens
+            mask = attention_mask[..., np.newaxis].astype(np.float32)
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            outputs.append(pooled)
+        
+        embeddings = np.concatenate(outputs).astype(np.float32)
+        embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+        return embeddings
+    
+    def encode(
+        self,
+        texts: Union[str, List[str]],
+        show_progress: bool = False,
+        batch_size: int = 32
+    ) -> np.ndarray:
         """
         Convert text(s) into vector embeddings
         
         Args:
             texts: Single text string or list of text strings
             show_progress: Show progress bar for batch encoding
+            batch_size: Number of texts per forward pass for list input
             
         Returns:
             numpy array of embeddings (single vector or matrix)
         """
         try:
+            if self.session is not None:
+                if isinstance(texts, str):
+                    return self._encode_onnx([texts], batch_size=1)[0]
+                return self._encode_onnx(list(texts), batch_size=batch_size)
+            
             # Handle single text
             if isinstance(texts, str):
                 embedding = self.model.encode(texts, show_progress_bar=False)
@@ -52,7 +148,8 @@ class Embedder:
             embeddings = self.model.encode(
                 texts, 
                 show_progress_bar=show_progress,
-                batch_size=32
+                batch_size=batch_size,
+                convert_to_numpy=True
             )
             return np.array(embeddings, dtype=np.float32)
             
@@ -81,6 +178,9 @@ class Embedder:
             numpy array of embeddings
         """
         try:
+            if self.session is not None:
+                return self._encode_onnx(list(texts), batch_size=batch_size)
+            
             embeddings = self.model.encode(
                 texts,
                 batch_size=batch_size,
@@ -0,0 +1,45 @@
+"""
+ONNX Export Script for NeuroDrive
+Purpose: One-time export of the embedding model to ONNX with int8 dynamic quantization
+
+Usage (from backend/):
+    python -m embeddings.export_onnx
+
+Requires: optimum[onnxruntime] (export) and onnxruntime + tokenizers (runtime).
+Embedder picks the quantized model up automatically from DEFAULT_ONNX_PATH.
+"""
+
+import os
+
+from embeddings.embedder import DEFAULT_ONNX_PATH
+
+
+def export_onnx(model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                output_path: str = DEFAULT_ONNX_PATH):
+    """
+    Export the transformer to ONNX and quantize its weights to int8
+
+    Args:
+        model_name: Hugging Face model id to export
+        output_path: Destination of the quantized model; tokenizer.json lands next to it
+    """
+    from optimum.exporters.onnx import main_export
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    output_dir = os.path.dirname(output_path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"[LOADING] Exporting {model_name} to ONNX...")
+    main_export(model_name, output=output_dir, task="feature-extraction")
+
+    print("[LOADING] Quantizing weights to int8...")
+    quantize_dynamic(
+        os.path.join(output_dir, "model.onnx"),
+        output_path,
+        weight_type=QuantType.QInt8
+    )
+    print(f"[OK] Quantized model saved to {output_path}")
+
+
+if __name__ == "__main__":
+    export_onnx()
@@ -1,63 +1,166 @@
+import io
+import os
+from typing import BinaryIO, Dict, Optional, Union
+
 from pypdf import PdfReader
 import docx
 
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+
 
-def extract_content(path: str, ext: str) -> str:
+def extract_content(path: str, ext: str, max_chars: Optional[int] = None) -> str:
     """
     Extracts text from a file based on its extension.
 
     :param path: Full file path.
     :param ext: File extension (e.g. '.pdf', '.docx', '.txt').
+    :param max_chars: Stop reading once this many characters are extracted (None = whole file).
     :return: Extracted text as a string (may be empty or contain an error message).
     """
     ext = (ext or "").lower().strip()
 
     if ext == ".pdf":
-        return _extract_pdf(path)
+        return _extract_pdf(path, max_chars=max_chars)
+    elif ext == ".docx":
+        return _extract_docx(path, max_chars=max_chars)
+    elif ext == ".txt":
+        return _extract_txt(path, max_chars=max_chars)
+    else:
+        return ""
+
+
+def extract_content_from_bytes(data: bytes, filename: str, max_chars: Optional[int] = None) -> str:
+    """
+    Extracts text from in-memory file contents (e.g. an HTTP upload).
+
+    :param data: Raw file bytes.
+    :param filename: Original file name; its extension selects the extractor.
+    :param max_chars: Stop reading once this many characters are extracted (None = whole file).
+    :return: Extracted text as a string (may be empty or contain an error message).
+    """
+    ext = os.path.splitext(filename or "")[1].lower()
+
+    if ext == ".pdf":
+        return _extract_pdf(io.BytesIO(data), filename, max_chars=max_chars)
     elif ext == ".docx":
-        return _extract_docx(path)
+        return _extract_docx(io.BytesIO(data), filename, max_chars=max_chars)
     elif ext == ".txt":
-        return _extract_txt(path)
+        if max_chars is not None:
+            # UTF-8 needs at most 4 bytes per character; decode only that prefix
+            data = memoryview(data)[:max_chars * 4]
+            return str(data, "utf-8", errors="ignore")[:max_chars]
+        return data.decode("utf-8", errors="ignore")
     else:
         return ""
 
 
-def _extract_pdf(path: str) -> str:
+def extract_file(file_info: Dict, max_chars: Optional[int] = None) -> str:
+    """
+    Extracts text for a scanned or uploaded file dict.
+
+    Module-level so it can be submitted to a ProcessPoolExecutor.
+
+    :param file_info: Dict with 'content' and 'name' (upload) or 'path' and 'ext' (file on disk).
+    :param max_chars: Stop reading once this many characters are extracted (None = whole file).
+    :return: Extracted text as a string (may be empty or contain an error message).
+    """
+    if "content" in file_info:
+        return extract_content_from_bytes(file_info["content"], file_info["name"], max_chars)
+    return extract_content(file_info["path"], file_info["ext"], max_chars)
+
+
+def _extract_pdf(source: Union[str, BinaryIO], name: str = None, max_chars: Optional[int] = None) -> str:
     """
-    Extract text from a PDF file.
+    Extract text from a PDF file path or binary stream.
+
+    Uses PDFium (native parser) when pypdfium2 is installed, pypdf otherwise.
     """
     try:
-        reader = PdfReader(path)
+        if PDFIUM_AVAILABLE:
+            return _truncate(_extract_pdf_pdfium(source, max_chars), max_chars)
+
+        reader = PdfReader(source)
         text_parts = []
+        length = 0
 
         for page in reader.pages:
             page_text = page.extract_text() or ""
             text_parts.append(page_text)
+            length += len(page_text) + 1
+            # Later pages would only be cut off again; don't parse them
+            if max_chars is not None and length >= max_chars:
+                break
 
-        return "\n".join(text_parts).strip()
+        return _truncate("\n".join(text_parts).strip(), max_chars)
 
     except Exception as e:
-        return f"Error reading PDF ({path}): {e}"
+        return f"Error reading PDF ({name or source}): {e}"
+
+
+def _extract_pdf_pdfium(source: Union[str, BinaryIO], max_chars: Optional[int] = None) -> str:
+    """
+    Extract text with pypdfium2, stopping once max_chars is reached.
+    """
+    pdf = pdfium.PdfDocument(source)
+    try:
+        text_parts = []
+        length = 0
 
+        for page in pdf:
+            textpage = page.get_textpage()
+            page_text = textpage.get_text_range()
+            textpage.close()
+            page.close()
+            text_parts.append(page_text)
+            length += len(page_text) + 1
+            if max_chars is not None and length >= max_chars:
+                break
+
+        return "\n".join(text_parts).strip()
+    finally:
+        pdf.close()
 
-def _extract_docx(path: str) -> str:
+
+def _extract_docx(source: Union[str, BinaryIO], name: str = None, max_chars: Optional[int] = None) -> str:
     """
-    Extract text from a DOCX file.
+    Extract text from a DOCX file path or binary stream.
     """
     try:
-        document = docx.Document(path)
-        paragraphs = [para.text for para in document.paragraphs]
-        return "\n".join(paragraphs).strip()
+        document = docx.Document(source)
+        paragraphs = []
+        length = 0
+
+        for para in document.paragraphs:
+            paragraphs.append(para.text)
+            length += len(para.text) + 1
+            if max_chars is not None and length >= max_chars:
+                break
+
+        return _truncate("\n".join(paragraphs).strip(), max_chars)
     except Exception as e:
-        return f"Error reading DOCX ({path}): {e}"
+        return f"Error reading DOCX ({name or source}): {e}"
 
 
-def _extract_txt(path: str) -> str:
+def _extract_txt(path: str, max_chars: Optional[int] = None) -> str:
     """
     Extract text from a TXT file.
     """
     try:
         with open(path, "r", encoding="utf-8", errors="ignore") as f:
-            return f.read()
+            # read(n) counts characters in text mode
+            return f.read(-1 if max_chars is None else max_chars)
     except Exception as e:
         return f"Error reading TXT ({path}): {e}"
+
+
+def _truncate(text: str, max_chars: Optional[int]) -> str:
+    """
+    Cut text down to max_chars (no copy when it is already short enough).
+    """
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    return text[:max_chars]
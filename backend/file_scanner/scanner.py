@@ -1,35 +1,82 @@
+import hashlib
 import os
 from pathlib import Path
-from typing import List, Dict, Union
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 
 
-def scan_directory(folder_path: str) -> Union[List[Dict], Dict]:
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """
+    Returns a BLAKE2b digest of the file contents, read in 1 MB chunks
+    so large files are never held in memory at once.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    """Returns the same digest as hash_file for in-memory content."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def iter_directory(folder_path: str, extensions: Optional[Iterable[str]] = None) -> Iterator[Dict]:
+    """
+    Walks the folder tree with os.scandir and yields file metadata.
+
+    Files whose lowercased extension is not in `extensions` are skipped
+    before they are stat'ed. Symlinked directories are not followed.
+    """
+    if extensions is not None:
+        extensions = frozenset(extensions)
+
+    stack = [folder_path]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    if extensions is not None and ext not in extensions:
+                        continue
+
+                    stat = entry.stat()
+                except OSError:
+                    continue
+
+                yield {
+                    "name": entry.name,
+                    "path": entry.path,
+                    "size": stat.st_size,
+                    "ext": ext,
+                    "created": stat.st_ctime,
+                    "modified": stat.st_mtime,
+                    "mtime_ns": stat.st_mtime_ns,
+                }
+
+
+def scan_directory(folder_path: str, extensions: Optional[Iterable[str]] = None) -> Union[List[Dict], Dict]:
     """
     Scans the given folder and returns a list of files with basic metadata.
+    Pass `extensions` (e.g. {".pdf", ".txt"}) to keep only those file types.
     """
     folder = Path(folder_path)
 
     if not folder.exists():
         return {"error": f"Folder does not exist: {folder_path}"}
 
-    files: List[Dict] = []
-
-    for root, dirs, filenames in os.walk(folder):
-        for name in filenames:
-            path = Path(root) / name
-            try:
-                stat = path.stat()
-                files.append(
-                    {
-                        "name": name,
-                        "path": str(path),
-                        "size": stat.st_size,
-                        "ext": path.suffix.lower(),
-                        "created": stat.st_ctime,
-                        "modified": stat.st_mtime,
-                    }
-                )
-            except OSError:
-                continue
-
-    return files
+    return list(iter_directory(str(folder), extensions))
@@ -2,96 +2,234 @@
 Hybrid Search Engine combining Semantic (FAISS) and Keyword (BM25) search
 """
 
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import numpy as np
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 import math
+import os
+import re
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Runs of letters/digits: splits on punctuation as well as whitespace
+TOKEN_RE = re.compile(r"[^\W_]+")
+STOP_WORDS = frozenset({
+    'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'been', 'be'
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stop words (same for documents and queries)"""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def count_terms(text: str) -> Counter:
+    """Term frequencies of one document (module-level so worker processes can run it)"""
+    return Counter(tokenize(text))
+
+
+@lru_cache(maxsize=1024)
+def query_terms(query: str) -> Tuple[str, ...]:
+    """Distinct tokens of a query in first-seen order (cached for repeated queries)"""
+    return tuple(dict.fromkeys(tokenize(query)))
+
+
+def _accumulate_scores_numpy(term_ids, indptr, indices, weights, scores):
+    """Add each query term's precomputed BM25 weights to scores (NumPy)"""
+    for t in term_ids:
+        start, end = indptr[t], indptr[t + 1]
+        scores[indices[start:end]] += weights[start:end]
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True, fastmath=True)
+    def _accumulate_scores(term_ids, indptr, indices, weights, scores):
+        """Add each query term's precomputed BM25 weights to scores (compiled)"""
+        for t in term_ids:
+            # A term's postings hold distinct documents, so its rows can be
+            # updated in parallel without write conflicts
+            for p in prange(indptr[t], indptr[t + 1]):
+                scores[indices[p]] += weights[p]
+else:
+    _accumulate_scores = _accumulate_scores_numpy
 
 
 class BM25:
-    """BM25 algorithm for keyword-based search"""
+    """
+    BM25 algorithm for keyword-based search
+    
+    The corpus is stored as an inverted index in CSR form: the postings of
+    term t are indices[indptr[t]:indptr[t + 1]] (document ids). Each
+    posting's full BM25 contribution (idf, tf and length normalization) is
+    computed once at index time and kept in weights, so scoring a query is
+    only a sum over the postings of its terms.
+    """
+    
+    # Below this many documents, starting worker processes costs more than
+    # tokenizing the previews in this process
+    PARALLEL_MIN_DOCS = 20000
     
     def __init__(self, corpus: List[str], k1: float = 1.5, b: float = 0.75):
         self.k1 = k1
         self.b = b
-        self.corpus = corpus
         self.corpus_size = len(corpus)
         
-        self.tokenized_corpus = [self._tokenize(doc) for doc in corpus]
-        self.doc_freqs = self._calculate_doc_frequencies()
-        self.idf = self._calculate_idf()
-        self.avgdl = sum(len(doc) for doc in self.tokenized_corpus) / self.corpus_size
-        self.doc_lens = [len(doc) for doc in self.tokenized_corpus]
+        self.vocab = {}  # term -> term id
+        self._build_index(corpus)
     
     def _tokenize(self, text: str) -> List[str]:
         """Simple tokenization"""
-        tokens = text.lower().split()
-        stop_words = {
-            'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-            'of', 'with', 'by', 'from', 'as', 'is', 'was', 'are', 'been', 'be'
-        }
-        return [token for token in tokens if token not in stop_words]
-    
-    def _calculate_doc_frequencies(self) -> Dict[str, int]:
-        """Calculate document frequency for each term"""
-        df = {}
-        for doc in self.tokenized_corpus:
-            unique_terms = set(doc)
-            for term in unique_terms:
-                df[term] = df.get(term, 0) + 1
-        return df
-    
-    def _calculate_idf(self) -> Dict[str, float]:
-        """Calculate IDF for each term"""
-        idf = {}
-        for term, df in self.doc_freqs.items():
-            idf[term] = math.log((self.corpus_size - df + 0.5) / (df + 0.5) + 1)
-        return idf
+        return tokenize(text)
+    
+    def _build_index(self, corpus: List[str]):
+        """Tokenize the corpus into CSR postings with precomputed BM25 weights"""
+        term_ids, doc_ids, term_freqs = [], [], []
+        doc_lens = np.zeros(self.corpus_size, dtype=np.float32)
+        
+        # Tokenizing and counting are independent per document; the vocab is
+        # built serially below
+        if self.corpus_size >= self.PARALLEL_MIN_DOCS and (os.cpu_count() or 1) > 1:
+            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+                doc_counts = list(executor.map(count_terms, corpus, chunksize=256))
+        else:
+            doc_counts = map(count_terms, corpus)
+        
+        for doc_idx, counts in enumerate(doc_counts):
+            doc_lens[doc_idx] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(self.vocab.setdefault(term, len(self.vocab)))
+                doc_ids.append(doc_idx)
+                term_freqs.append(tf)
+        
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        # Group postings by term; the stable sort keeps doc ids ascending
+        order = np.argsort(term_ids, kind='stable')
+        self.indices = np.asarray(doc_ids, dtype=np.int32)[order]
+        tfs = np.asarray(term_freqs, dtype=np.float32)[order]
+        
+        doc_freqs = np.bincount(term_ids, minlength=len(self.vocab))
+        self.indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(doc_freqs, out=self.indptr[1:])
+        
+        self.idfs = np.log(
+            (self.corpus_size - doc_freqs + 0.5) / (doc_freqs + 0.5) + 1
+        ).astype(np.float32)
+        
+        self.doc_lens = doc_lens
+        self.avgdl = float(doc_lens.mean()) if self.corpus_size else 0.0
+        # k1 * (1 - b + b * dl / avgdl) depends only on the document
+        length_norms = (
+            self.k1 * (1 - self.b + self.b * doc_lens / max(self.avgdl, 1e-9))
+        ).astype(np.float32)
+        
+        # idf(t) * tf * (k1 + 1) / (tf + length_norm(d)) for every posting
+        posting_idfs = np.repeat(self.idfs, doc_freqs)
+        self.weights = (
+            posting_idfs * tfs * np.float32(self.k1 + 1) / (tfs + length_norms[self.indices])
+        ).astype(np.float32)
+    
+    def _term_ids(self, query: str) -> np.ndarray:
+        """
+        Ids of the query's indexed terms (unknown terms can't score)
+        
+        A term repeated in the query counts once.
+        """
+        return np.asarray(
+            [self.vocab[token] for token in query_terms(query) if token in self.vocab],
+            dtype=np.int32
+        )
     
     def get_scores(self, query: str) -> np.ndarray:
         """Calculate BM25 scores for query against all documents"""
-        query_tokens = self._tokenize(query)
-        scores = np.zeros(self.corpus_size)
-        
-        for doc_idx, doc in enumerate(self.tokenized_corpus):
-            doc_len = self.doc_lens[doc_idx]
-            score = 0
-            term_freqs = Counter(doc)
-            
-            for term in query_tokens:
-                if term not in term_freqs:
-                    continue
-                
-                idf = self.idf.get(term, 0)
-                tf = term_freqs[term]
-                
-                numerator = tf * (self.k1 + 1)
-                denominator = tf + self.k1 * (1 - self.b + self.b * (doc_len / self.avgdl))
-                
-                score += idf * (numerator / denominator)
-            
-            scores[doc_idx] = score
+        scores = np.zeros(self.corpus_size, dtype=np.float32)
+        
+        term_ids = self._term_ids(query)
+        if len(term_ids):
+            _accumulate_scores(term_ids, self.indptr, self.indices, self.weights, scores)
+        
+        return scores
+    
+    def get_scores_for(self, query: str, doc_ids: np.ndarray) -> np.ndarray:
+        """
+        BM25 scores of only the given documents, aligned with doc_ids
+        
+        Each term's postings are sorted by document id, so the candidates are
+        found with a binary search instead of scoring the whole corpus. Ids
+        outside the corpus score 0.
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int32)
+        scores = np.zeros(len(doc_ids), dtype=np.float32)
+        
+        for t in self._term_ids(query):
+            start, end = self.indptr[t], self.indptr[t + 1]
+            postings = self.indices[start:end]
+            # Every indexed term has at least one posting, so end - start >= 1
+            pos = np.minimum(np.searchsorted(postings, doc_ids), end - start - 1)
+            found = postings[pos] == doc_ids
+            scores[found] += self.weights[start + pos[found]]
         
         return scores
 
 
+FUSION_MODES = ('convex', 'rrf')
+
+# Rank offset for Reciprocal Rank Fusion (the usual default from the RRF paper)
+RRF_K = 60
+
+
 class HybridSearchEngine:
-    """Combines semantic (FAISS) and keyword (BM25) search"""
+    """
+    Combines semantic (FAISS) and keyword (BM25) search
+    
+    Fusion modes:
+        convex: alpha * cosine similarity + (1 - alpha) * min-max normalized
+                BM25, both in [0, 1]
+        rrf:    Reciprocal Rank Fusion, 1 / (rrf_k + rank) summed over the
+                semantic and keyword rankings (alpha is not used), divided
+                by the best possible sum 2 / (rrf_k + 1) so it is in [0, 1]
     
-    def __init__(self, embedder, faiss_db, alpha: float = 0.7):
+    min_score applies to the fused score, so under both modes it is a
+    fraction of the best possible match.
+    """
+    
+    def __init__(
+        self,
+        embedder,
+        faiss_db,
+        alpha: float = 0.7,
+        fusion: str = 'convex',
+        rrf_k: int = RRF_K
+    ):
+        if fusion not in FUSION_MODES:
+            raise ValueError(f"Unknown fusion mode: {fusion}")
+        
         self.embedder = embedder
         self.faiss_db = faiss_db
         self.alpha = alpha
+        self.fusion = fusion
+        self.rrf_k = rrf_k
         self.bm25 = None
+        # faiss_db.version the BM25 index was built from
+        self.indexed_version = None
         self._build_bm25_index()
     
     def _build_bm25_index(self):
         """Build BM25 index from FAISS metadata"""
+        self.indexed_version = getattr(self.faiss_db, 'version', None)
+        
         if not self.faiss_db.metadata:
+            self.bm25 = None
             print("[WARN]  No documents in database, BM25 index not built")
             return
         
-        documents = [m.get('text', '') for m in self.faiss_db.metadata]
+        documents = [m.get('preview', m.get('text', '')) for m in self.faiss_db.metadata]
         self.bm25 = BM25(documents)
         print(f"[OK] BM25 index built with {len(documents)} documents")
     
@@ -104,71 +242,120 @@ class HybridSearchEngine:
         query: str, 
         k: int = 10,
         alpha: Optional[float] = None,
-        min_score: float = 0.0
+        min_score: float = 0.0,
+        precomputed_embedding: Optional[np.ndarray] = None,
+        fusion: Optional[str] = None
     ) -> List[Dict]:
-        """Hybrid search combining semantic and keyword matching"""
+        """
+        Hybrid search combining semantic and keyword matching
+        
+        precomputed_embedding lets callers that already hold the query vector
+        (e.g. from the embedding cache) skip encoding it again. fusion
+        overrides the engine's fusion mode for this query.
+        """
         if alpha is None:
             alpha = self.alpha
+        fusion = fusion or self.fusion
+        if fusion not in FUSION_MODES:
+            raise ValueError(f"Unknown fusion mode: {fusion}")
         
-        if self.bm25 is None:
+        # A convex weight of 1 means BM25 can't change anything: skip it
+        if fusion == 'convex' and alpha >= 1.0:
+            return self._semantic_only_search(query, k, precomputed_embedding, min_score)
+        
+        # Rebuilt once per change to the stored files (a whole scan batch),
+        # on the first search that needs it
+        if self.bm25 is None or self.indexed_version != getattr(self.faiss_db, 'version', None):
             self._build_bm25_index()
         
         if self.bm25 is None:
             print("[WARN]  BM25 not available, using semantic search only")
-            return self._semantic_only_search(query, k)
+            return self._semantic_only_search(query, k, precomputed_embedding, min_score)
+        
+        # ...and a weight of 0 means the query doesn't need embedding or FAISS
+        if fusion == 'convex' and alpha <= 0.0:
+            return self._keyword_only_search(query, k, min_score)
         
         # Semantic search
-        query_embedding = self.embedder.encode(query)
+        query_embedding = (
+            precomputed_embedding if precomputed_embedding is not None
+            else self.embedder.encode(query)
+        )
         semantic_results = self.faiss_db.search(query_embedding, k=min(k * 3, 100))
         
         if not semantic_results:
             return []
         
-        # Get BM25 scores
-        bm25_scores = self.bm25.get_scores(query)
+        n = len(semantic_results)
+        semantic = np.fromiter(
+            (r.get('similarity_score', 0) for r in semantic_results), dtype=np.float32, count=n
+        )
         
-        # Normalize BM25 scores
-        if bm25_scores.max() > 0:
-            bm25_scores_normalized = bm25_scores / bm25_scores.max()
-        else:
-            bm25_scores_normalized = bm25_scores
-        
-        # Combine scores
-        combined_results = {}
-        
-        for result in semantic_results:
-            doc_idx = result.get('rank', 1) - 1
-            semantic_score = result.get('similarity_score', 0)
-            bm25_score = (
-                bm25_scores_normalized[doc_idx] 
-                if doc_idx < len(bm25_scores_normalized) 
-                else 0
+        # BM25 scores of just these candidates, by index row; documents added
+        # after the BM25 index was built score 0
+        doc_ids = np.fromiter((r['doc_id'] for r in semantic_results), dtype=np.int32, count=n)
+        keyword = self.bm25.get_scores_for(query, doc_ids)
+        
+        if fusion == 'rrf':
+            # Semantic results arrive best first; keyword ranks are among the
+            # same candidates, and candidates without a keyword match add nothing.
+            # Ranks and the match test use raw BM25: min-max would zero the
+            # weakest real match
+            ranks = np.arange(1, n + 1)
+            keyword_ranks = np.empty(n, dtype=np.int64)
+            keyword_ranks[np.argsort(-keyword, kind='stable')] = ranks
+            hybrid = 1.0 / (self.rrf_k + ranks) + np.where(
+                keyword > 0, 1.0 / (self.rrf_k + keyword_ranks), 0.0
             )
-            
-            hybrid_score = alpha * semantic_score + (1 - alpha) * bm25_score
-            
-            if hybrid_score >= min_score:
-                result['semantic_score'] = float(semantic_score)
-                result['bm25_score'] = float(bm25_score)
-                result['hybrid_score'] = float(hybrid_score)
-                result['search_method'] = 'hybrid'
-                combined_results[result['path']] = result
-        
-        # Sort by hybrid score
-        final_results = sorted(
-            combined_results.values(),
-            key=lambda x: x['hybrid_score'],
-            reverse=True
-        )[:k]
-        
-        for i, result in enumerate(final_results, 1):
-            result['rank'] = i
+            # Raw sums are at most ~0.033; rescale so min_score and the
+            # reported score read on the same [0, 1] scale as convex fusion
+            hybrid *= (self.rrf_k + 1) / 2.0
+        else:
+            # Min-max over the candidates puts BM25 in [0, 1] like cosine similarity
+            low, high = keyword.min(), keyword.max()
+            if high > low:
+                keyword = (keyword - low) / (high - low)
+            elif high > 0:
+                keyword = np.ones_like(keyword)
+            hybrid = alpha * semantic + (1 - alpha) * keyword
+        
+        # One candidate per path (the last row wins, as a file indexed again
+        # after a rescan has several), above min_score
+        by_path = {
+            semantic_results[i]['path']: i
+            for i in np.flatnonzero(hybrid >= min_score).tolist()
+        }
+        candidates = np.fromiter(by_path.values(), dtype=np.int64, count=len(by_path))
+        
+        # Top k by hybrid score: partition first, then sort only those k
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-hybrid[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-hybrid[candidates], kind='stable')]
+        
+        final_results = []
+        for rank, i in enumerate(candidates.tolist(), 1):
+            result = semantic_results[i]
+            result['semantic_score'] = float(semantic[i])
+            result['bm25_score'] = float(keyword[i])
+            result['hybrid_score'] = float(hybrid[i])
+            result['search_method'] = 'hybrid'
+            result['rank'] = rank
+            final_results.append(result)
         
         return final_results
     
-    def _semantic_only_search(self, query: str, k: int) -> List[Dict]:
+    def _semantic_only_search(
+        self,
+        query: str,
+        k: int,
+        precomputed_embedding: Optional[np.ndarray] = None,
+        min_score: float = 0.0
+    ) -> List[Dict]:
         """Fallback to semantic-only search"""
-        query_embedding = self.embedder.encode(query)
+        query_embedding = (
+            precomputed_embedding if precomputed_embedding is not None
+            else self.embedder.encode(query)
+        )
         results = self.faiss_db.search(query_embedding, k=k)
         
         for result in results:
@@ -176,8 +363,48 @@ class HybridSearchEngine:
             result['hybrid_score'] = result['semantic_score']
             result['search_method'] = 'semantic_only'
         
+        if min_score > 0:
+            results = [r for r in results if r['hybrid_score'] >= min_score]
+            for i, result in enumerate(results, 1):
+                result['rank'] = i
+        
         return results
     
+    def _keyword_only_search(self, query: str, k: int, min_score: float = 0.0) -> List[Dict]:
+        """BM25-only search (scores scaled so the best match is 1.0)"""
+        scores = self.bm25.get_scores(query)
+        
+        # Only documents that contain a query term, best first
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        matched = matched[np.argsort(-scores[matched], kind='stable')]
+        if not len(matched):
+            return []
+        
+        normalized = (scores[matched] / scores[matched[0]]).tolist()
+        metadata = self.faiss_db.metadata
+        
+        results = []
+        for doc_id, bm25_score in zip(matched.tolist(), normalized):
+            if bm25_score < min_score:
+                break
+            # The document and any identical copies stored as its aliases
+            file_info = metadata[doc_id]
+            for entry in (file_info, *file_info.get('aliases', ())):
+                results.append({
+                    **file_info,
+                    **entry,
+                    'doc_id': doc_id,
+                    'similarity_score': 0.0,
+                    'bm25_score': bm25_score,
+                    'hybrid_score': bm25_score,
+                    'search_method': 'keyword_only',
+                    'rank': len(results) + 1
+                })
+        
+        return results[:k]
+    
     def explain_score(self, result: Dict) -> str:
         """Generate explanation for search result score"""
         explanation = f" Score Breakdown for '{result['name']}':\n"
@@ -0,0 +1,180 @@
+"""
+FAISS database persistence tests for NeuroDrive
+Round-trips the append log: flush, reload with log replay, compaction by
+save, and recovery from a log record cut short by a crash. Also checks that
+adding and searching leave the caller's arrays untouched, and that copies of
+a file stored as aliases share its vector.
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vector_db.faiss_db import FAISSDatabase
+
+
+DIMENSION = 16
+
+
+def make_batch(start, count):
+    """Random vectors with matching metadata for files start .. start + count - 1"""
+    rng = np.random.default_rng(start)
+    vectors = rng.standard_normal((count, DIMENSION)).astype(np.float32)
+    file_infos = [
+        {
+            'path': f'/docs/file{i}.txt',
+            'name': f'file{i}.txt',
+            'ext': '.txt',
+            'size': 100 + i,
+            'preview': f'Sample text {i}',
+            'content_hash': f'hash{i}'
+        }
+        for i in range(start, start + count)
+    ]
+    return vectors, file_infos
+
+
+def open_db(folder):
+    return FAISSDatabase(dimension=DIMENSION, index_path=os.path.join(folder, 'index.bin'))
+
+
+def test_flush_then_reload_replays_log():
+    with tempfile.TemporaryDirectory() as folder:
+        db = open_db(folder)
+        vectors, file_infos = make_batch(0, 5)
+        db.add_batch(vectors, file_infos)
+        db.flush()
+
+        # Only the log was written; the index file appears on the first save
+        assert os.path.exists(db.log_path)
+        assert not os.path.exists(db.index_path)
+
+        reloaded = open_db(folder)
+        assert reloaded.index.ntotal == 5
+        assert reloaded.metadata == file_infos
+        assert reloaded.find_duplicate('hash3')[2]['name'] == 'file3.txt'
+
+        top = reloaded.search(vectors[2], k=1)[0]
+        assert top['name'] == 'file2.txt'
+        assert abs(top['similarity_score'] - 1.0) < 1e-4
+
+
+def test_save_compacts_log():
+    with tempfile.TemporaryDirectory() as folder:
+        db = open_db(folder)
+        db.add_batch(*make_batch(0, 5))
+        db.flush()
+
+        db = open_db(folder)
+        db.add_batch(*make_batch(5, 3))
+        db.flush()
+        assert open_db(folder).index.ntotal == 8
+
+        db.save()
+        assert not os.path.exists(db.log_path)
+        assert os.path.exists(db.index_path)
+
+        reloaded = open_db(folder)
+        assert reloaded.index.ntotal == 8
+        assert len(reloaded.metadata) == 8
+        assert [m['name'] for m in reloaded.metadata] == [f'file{i}.txt' for i in range(8)]
+
+
+def test_arguments_not_normalized_in_place():
+    with tempfile.TemporaryDirectory() as folder:
+        db = open_db(folder)
+        vectors, file_infos = make_batch(0, 5)
+        original = vectors.copy()
+        db.add_batch(vectors, file_infos)
+        db.add(vectors[0] * 3, {**file_infos[0], 'path': '/docs/copy.txt'})
+
+        query = vectors[1] * 2
+        db.search(query, k=2)
+        db.search_batch(vectors[:2], k=2)
+
+        np.testing.assert_array_equal(vectors, original)
+        np.testing.assert_array_equal(query, original[1] * 2)
+
+
+def test_aliases_share_vector():
+    with tempfile.TemporaryDirectory() as folder:
+        db = open_db(folder)
+        vectors, file_infos = make_batch(0, 3)
+        db.add_batch(vectors, file_infos)
+        db.flush()
+
+        vector_id, _, original = db.find_duplicate('hash1')
+        copy = {**original, 'path': '/backup/file1.txt'}
+        assert db.add_aliases([(vector_id, copy), (7, copy)]) == 1
+        db.flush()
+
+        def check(database):
+            assert database.index.ntotal == 3
+            assert len(database.file_list) == 4
+            results = database.search(vectors[1], k=2)
+            assert [r['path'] for r in results] == ['/docs/file1.txt', '/backup/file1.txt']
+            assert results[0]['similarity_score'] == results[1]['similarity_score']
+            assert [r['rank'] for r in results] == [1, 2]
+
+        check(db)
+        assert db.has_file('/backup/file1.txt', 'hash1')
+        assert db.has_file('/docs/file2.txt', 'hash2')
+        assert not db.has_file('/docs/file2.txt', 'hash1')
+        # Aliases come back from the log, then from the metadata file
+        reloaded = open_db(folder)
+        check(reloaded)
+        reloaded.compact()
+        assert not os.path.exists(reloaded.log_path)
+        check(open_db(folder))
+
+
+def test_truncated_log_record():
+    with tempfile.TemporaryDirectory() as folder:
+        db = open_db(folder)
+        db.add_batch(*make_batch(0, 4))
+        db.flush()
+        first_record_end = os.path.getsize(db.log_path)
+        db.add_batch(*make_batch(4, 3))
+        db.flush()
+        second_record_end = os.path.getsize(db.log_path)
+
+        with open(db.log_path, 'rb') as f:
+            log_bytes = f.read()
+
+        # A crash can cut the last record anywhere; each cut must replay the
+        # intact first record and drop the partial one. Two bytes in, pickle
+        # reports a plain EOFError rather than truncated data
+        cuts = (
+            first_record_end + 1,
+            first_record_end + 2,
+            (first_record_end + second_record_end) // 2,
+            second_record_end - 1
+        )
+        for cut in cuts:
+            with open(db.log_path, 'wb') as f:
+                f.write(log_bytes[:cut])
+
+            reloaded = open_db(folder)
+            assert reloaded.index.ntotal == 4
+            assert [m['name'] for m in reloaded.metadata] == [f'file{i}.txt' for i in range(4)]
+            assert os.path.getsize(db.log_path) == first_record_end
+
+            # Appends after recovery stay readable
+            reloaded.add_batch(*make_batch(10, 2))
+            reloaded.flush()
+            again = open_db(folder)
+            assert again.index.ntotal == 6
+            assert again.metadata[-1]['name'] == 'file11.txt'
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print(f"\n{len(tests)} FAISS persistence tests passed")
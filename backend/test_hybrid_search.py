@@ -0,0 +1,171 @@
+"""
+BM25 scoring tests for NeuroDrive
+Checks the CSR index (get_scores, get_scores_for and both accumulation
+kernels) against the plain per-document BM25 formula on a small corpus,
+and the scale min_score is applied on under Reciprocal Rank Fusion.
+"""
+
+import math
+import os
+import sys
+from collections import Counter
+
+import numpy as np
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from search import hybrid_search
+from search.hybrid_search import BM25, HybridSearchEngine, tokenize
+
+
+CORPUS = [
+    "Machine learning models learn patterns from data.",
+    "The budget report for the marketing team, Q3 budget and Q4 budget.",
+    "Deep learning is a subset of machine learning; neural networks learn.",
+    "Quarterly report: revenue, costs and the marketing budget.",
+    "",
+    "Python scripts for data cleaning and data visualisation.",
+    "Notes from the team meeting about the learning roadmap.",
+]
+
+QUERIES = [
+    "machine learning",
+    "budget report",
+    "data data data",          # repeated terms count once
+    "Marketing, BUDGET!",      # case and punctuation
+    "learning roadmap team",
+]
+
+
+def reference_scores(corpus, query, k1=1.5, b=0.75):
+    """BM25 computed document by document, the way the original engine did"""
+    docs = [tokenize(doc) for doc in corpus]
+    n = len(docs)
+    avgdl = sum(len(doc) for doc in docs) / n
+
+    doc_freqs = Counter()
+    for doc in docs:
+        doc_freqs.update(set(doc))
+
+    scores = np.zeros(n)
+    for doc_idx, doc in enumerate(docs):
+        term_freqs = Counter(doc)
+        for term in dict.fromkeys(tokenize(query)):
+            if term not in term_freqs:
+                continue
+            df = doc_freqs[term]
+            idf = math.log((n - df + 0.5) / (df + 0.5) + 1)
+            tf = term_freqs[term]
+            denominator = tf + k1 * (1 - b + b * (len(doc) / avgdl))
+            scores[doc_idx] += idf * (tf * (k1 + 1) / denominator)
+
+    return scores
+
+
+def test_get_scores_matches_reference():
+    bm25 = BM25(CORPUS)
+    for query in QUERIES:
+        np.testing.assert_allclose(
+            bm25.get_scores(query), reference_scores(CORPUS, query), rtol=1e-5, atol=1e-6
+        )
+
+
+def test_get_scores_for_matches_get_scores():
+    bm25 = BM25(CORPUS)
+    # Unsorted, repeated and partial candidate lists, as FAISS returns them
+    doc_ids = np.array([5, 0, 3, 3, 6, 1], dtype=np.int32)
+    for query in QUERIES:
+        expected = reference_scores(CORPUS, query)[doc_ids]
+        np.testing.assert_allclose(
+            bm25.get_scores_for(query, doc_ids), expected, rtol=1e-5, atol=1e-6
+        )
+
+
+def test_get_scores_for_out_of_range_ids():
+    bm25 = BM25(CORPUS)
+    n = len(CORPUS)
+    # Rows added to FAISS after the BM25 index was built have ids past its end
+    doc_ids = np.array([n, 2, n + 5, -1, 0], dtype=np.int32)
+    scores = bm25.get_scores_for("machine learning", doc_ids)
+
+    expected = reference_scores(CORPUS, "machine learning")
+    np.testing.assert_allclose(scores[[1, 4]], expected[[2, 0]], rtol=1e-5, atol=1e-6)
+    assert scores[[0, 2, 3]].tolist() == [0.0, 0.0, 0.0]
+
+
+def test_query_without_known_terms():
+    bm25 = BM25(CORPUS)
+    for query in ("zebra quantum", "the and of", ""):
+        assert not bm25.get_scores(query).any()
+        assert not bm25.get_scores_for(query, np.arange(len(CORPUS))).any()
+
+
+def test_numpy_kernel_matches_reference():
+    bm25 = BM25(CORPUS)
+    for query in QUERIES:
+        scores = np.zeros(bm25.corpus_size, dtype=np.float32)
+        hybrid_search._accumulate_scores_numpy(
+            bm25._term_ids(query), bm25.indptr, bm25.indices, bm25.weights, scores
+        )
+        np.testing.assert_allclose(scores, reference_scores(CORPUS, query), rtol=1e-5, atol=1e-6)
+        # Whichever kernel get_scores uses (numba when installed) agrees with it
+        np.testing.assert_allclose(bm25.get_scores(query), scores, rtol=1e-5, atol=1e-6)
+
+
+class FakeDatabase:
+    """Stands in for FAISSDatabase: CORPUS as metadata, semantic results in a fixed order"""
+
+    version = 1
+
+    def __init__(self, order):
+        self.order = order
+        self.metadata = [
+            {'path': f'/docs/doc{i}.txt', 'name': f'doc{i}.txt', 'preview': text}
+            for i, text in enumerate(CORPUS)
+        ]
+
+    def search(self, query_embedding, k=5):
+        return [
+            {**self.metadata[doc_id], 'doc_id': doc_id, 'similarity_score': 0.9 - 0.1 * rank}
+            for rank, doc_id in enumerate(self.order[:k])
+        ]
+
+
+def test_rrf_min_score():
+    order = [2, 0, 6, 5, 1, 3, 4]
+    engine = HybridSearchEngine(None, FakeDatabase(order), fusion='rrf')
+    query = "machine learning"
+
+    # Fused score by hand, scaled by the best possible 2 / (k + 1)
+    keyword = reference_scores(CORPUS, query)[order]
+    keyword_ranks = {doc: rank for rank, doc in enumerate(np.argsort(-keyword, kind='stable'), 1)}
+    expected = {}
+    for rank, doc_id in enumerate(order, 1):
+        score = 1 / (60 + rank)
+        if keyword[rank - 1] > 0:
+            score += 1 / (60 + keyword_ranks[rank - 1])
+        expected[f'doc{doc_id}.txt'] = score * 61 / 2
+
+    embedding = np.zeros(4, dtype=np.float32)
+    results = engine.search(query, k=10, min_score=0.0, precomputed_embedding=embedding)
+    assert results[0]['name'] == 'doc2.txt'
+    assert abs(results[0]['hybrid_score'] - 1.0) < 1e-6
+    for result in results:
+        assert abs(result['hybrid_score'] - expected[result['name']]) < 1e-6
+
+    # A cosine-style threshold keeps the strong fused matches, not nothing
+    min_score = 0.5
+    kept = engine.search(query, k=10, min_score=min_score, precomputed_embedding=embedding)
+    assert sorted(r['name'] for r in kept) == sorted(
+        name for name, score in expected.items() if score >= min_score
+    )
+    assert 1 < len(kept) < len(results)
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"[OK] {test.__name__}")
+    print(f"\n{len(tests)} hybrid search tests passed (numba kernel: {hybrid_search.NUMBA_AVAILABLE})")
@@ -101,9 +101,8 @@ def test_full_pipeline():
     
     db = FAISSDatabase(dimension=embedder.get_dimension(), index_path=INDEX_PATH)
     
-    # Add files one by one (with metadata)
-    for embedding, file_info in zip(embeddings, file_data):
-        db.add(embedding, file_info)
+    # Add all files (with metadata) in one batch
+    db.add_batch(embeddings, file_data)
     
     stats = db.get_stats()
     print(f"✅ Database Statistics:")
@@ -3,8 +3,9 @@ Input Validation and Security Module
 Prevents crashes, security issues, and resource exhaustion
 """
 
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List, Set
+from typing import Optional, Set, Tuple
 import re
 import os
 
@@ -52,6 +53,11 @@ class InputValidator:
         r'\|',    # Pipe operator
         r';',     # Command chaining
     ]
+    # All of the above in one pattern, so a path is scanned once
+    DANGEROUS_RE = re.compile('|'.join(DANGEROUS_PATTERNS))
+    
+    # Characters stripped from search queries
+    QUERY_STRIP_RE = re.compile(r'[<>{}[\]\\]')
     
     @staticmethod
     def validate_folder_path(path: str, must_exist: bool = True) -> Path:
@@ -63,26 +69,28 @@ class InputValidator:
             raise InvalidPathError(f"Path too long (max {InputValidator.MAX_PATH_LENGTH} chars)")
         
         # Check for dangerous patterns
-        for pattern in InputValidator.DANGEROUS_PATTERNS:
-            if re.search(pattern, path):
-                raise SecurityError(f"Dangerous pattern detected in path: {pattern}")
+        match = InputValidator.DANGEROUS_RE.search(path)
+        if match:
+            raise SecurityError(f"Dangerous pattern detected in path: {match.group()}")
         
         try:
             # Convert to absolute path
             p = Path(path).resolve()
             
-            # Check if path exists
-            if must_exist and not p.exists():
-                raise InvalidPathError(f"Path does not exist: {path}")
-            
-            # Check if it's a directory
+            # Check it's an existing directory (one stat when it is)
             if must_exist and not p.is_dir():
+                if not p.exists():
+                    raise InvalidPathError(f"Path does not exist: {path}")
                 raise InvalidPathError(f"Path is not a directory: {path}")
             
-            # Security: Check if path is under allowed roots
-            allowed_roots = InputValidator._get_allowed_roots()
-            
-            if not any(InputValidator._is_subpath(p, root) for root in allowed_roots):
+            # Security: Check if path is under allowed roots (string prefix
+            # test on the resolved path; roots are precomputed)
+            path_str = str(p)
+            if not any(
+                path_str == root or path_str.startswith(prefix)
+                for root, prefix in InputValidator._get_allowed_root_prefixes()
+            ):
+                allowed_roots = InputValidator._get_allowed_roots()
                 raise SecurityError(
                     f"Access denied: Path not in allowed directories. "
                     f"Allowed roots: {[str(r) for r in allowed_roots]}"
@@ -154,13 +162,19 @@ class InputValidator:
                 f"Query too long (max {InputValidator.MAX_QUERY_LENGTH} chars)"
             )
         
-        sanitized = re.sub(r'[<>{}[\]\\]', '', query)
+        sanitized = InputValidator.QUERY_STRIP_RE.sub('', query)
         
         return sanitized
     
     @staticmethod
-    def _get_allowed_roots() -> List[Path]:
-        """Get list of allowed root directories"""
+    @lru_cache(maxsize=1)
+    def _get_allowed_roots() -> Tuple[Path, ...]:
+        """
+        Get allowed root directories
+        
+        Computed once per process: the roots only depend on the home, project
+        and working directories, which don't change while the server runs.
+        """
         allowed = []
         
         allowed.append(Path.home())
@@ -181,7 +195,16 @@ class InputValidator:
             if desktop.exists():
                 allowed.append(desktop)
         
-        return allowed
+        return tuple(allowed)
+    
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _get_allowed_root_prefixes() -> Tuple[Tuple[str, str], ...]:
+        """(root, root + separator) strings of the allowed roots, for prefix checks"""
+        return tuple(
+            (str(root), os.path.join(str(root), ''))
+            for root in InputValidator._get_allowed_roots()
+        )
     
     @staticmethod
     def _is_subpath(path: Path, parent: Path) -> bool:
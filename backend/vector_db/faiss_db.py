@@ -8,43 +8,241 @@ import faiss
 import numpy as np
 import pickle
 import os
+import time
 from typing import List, Dict, Optional, Tuple
 
+# FAISS only parallelizes over the OpenMP threads it is given; under uvicorn
+# that can default to a single thread
+faiss.omp_set_num_threads(os.cpu_count() or 1)
+
+# Metadata keeps only a text preview per file; full text stays on disk at 'path'
+PREVIEW_CHARS = 1000
+
+# Protocol 5 writes NumPy array buffers (append log) straight into the stream
+PICKLE_PROTOCOL = 5
+
 
 class FAISSDatabase:
     """
     Manages FAISS vector database with file metadata
+    
+    Vectors are L2-normalized on insert and stored in an inner-product index,
+    so search scores are cosine similarities with no per-query conversion.
+    Large indexes are stored as int8 scalar-quantized codes (4x smaller than
+    float32) and, beyond that, searched through an HNSW graph.
+    
+    Files with identical content share one vector: the first file's metadata
+    lists the others under 'aliases', and search returns every path.
     """
     
-    def __init__(self, dimension: int = 384, index_path: str = None):
+    # Quantize stored vectors to int8 once the corpus is this large
+    SQ_THRESHOLD = 10000
+    # Switch from exhaustive search to HNSW once the corpus is this large
+    HNSW_THRESHOLD = 50000
+    HNSW_M = 32
+    # Graph build / query beam widths (faiss defaults of 40 / 16 trade away recall)
+    HNSW_EF_CONSTRUCTION = 200
+    HNSW_EF_SEARCH = 64
+    # flush() appends new vectors to a log; the full index is only rewritten
+    # once this many vectors have accumulated there (or on save/shutdown)
+    COMPACT_EVERY = 1000
+    
+    def __init__(self, dimension: int = 384, index_path: str = None, quantize: bool = True):
         """
         Initialize FAISS database
         
         Args:
             dimension: Dimension of embedding vectors
             index_path: Path to save/load FAISS index
+            quantize: Store vectors as int8 codes once the corpus passes
+                      SQ_THRESHOLD (False keeps full float32 vectors)
         """
         self.dimension = dimension
+        self.quantize = quantize
         self.index_path = index_path or "./data/indexes/faiss_index.bin"
         self.metadata_path = self.index_path.replace('.bin', '_metadata.pkl')
+        self.log_path = self.index_path.replace('.bin', '_log.pkl')
         
         # Initialize index
         self.index = None
         self.metadata = []  # Store file information
+        # Public per-file fields (name, path, ext, size), one per path including aliases
+        self.file_list = []
+        # content_hash -> id of the first vector stored for that content
+        self.hash_to_id = {}
+        # path -> content_hash of every stored file, aliases included
+        self.path_hashes = {}
+        # Changes whenever the stored files change (used as an HTTP ETag)
+        self.version = time.time_ns()
+        # Vectors [0, saved_count) are in the index file, [saved_count, logged_count) in the log
+        self.saved_count = 0
+        self.logged_count = 0
+        # Raw (vectors, file_infos) added since the last flush; alias records
+        # are (None, [(vector_id, alias), ...])
+        self._unlogged = []
         
         # Try to load existing index, otherwise create new
         if os.path.exists(self.index_path):
             self.load()
         else:
             self._create_new_index()
+            self._replay_log()
     
     def _create_new_index(self):
         """Create a new FAISS index"""
         print(f"[INIT] Creating new FAISS index (dimension: {self.dimension})...")
-        self.index = faiss.IndexFlatL2(self.dimension)
+        self.index = faiss.IndexFlatIP(self.dimension)
         self.metadata = []
+        self._rebuild_lookups()
         print("[OK] New index created")
     
+    @staticmethod
+    def _file_entry(file_info: Dict) -> Dict:
+        """Project metadata down to the fields listed by the file API"""
+        return {
+            'name': file_info['name'],
+            'path': file_info['path'],
+            'ext': file_info.get('ext', ''),
+            'size': file_info.get('size', 0)
+        }
+    
+    def _rebuild_lookups(self):
+        """Recompute file_list, hash_to_id and path_hashes from metadata and its aliases (after load/clear)"""
+        self.file_list = []
+        self.hash_to_id = {}
+        self.path_hashes = {}
+        self._extend_lookups(self.metadata, start=0)
+    
+    def _extend_lookups(self, file_infos: List[Dict], start: int = None):
+        """Add lookup entries for metadata stored at ids start, start + 1, ..."""
+        if start is None:
+            start = len(self.metadata) - len(file_infos)
+        
+        for offset, file_info in enumerate(file_infos):
+            aliases = file_info.get('aliases', ())
+            self.file_list.append(self._file_entry(file_info))
+            self.file_list.extend(aliases)
+            content_hash = file_info.get('content_hash')
+            if content_hash:
+                self.hash_to_id.setdefault(content_hash, start + offset)
+                self.path_hashes[file_info['path']] = content_hash
+                self.path_hashes.update((alias['path'], content_hash) for alias in aliases)
+        self.version += 1
+    
+    def has_file(self, path: str, content_hash: str) -> bool:
+        """Whether path is already stored with this content (as a file or an alias)"""
+        return content_hash is not None and self.path_hashes.get(path) == content_hash
+    
+    def find_duplicate(self, content_hash: str) -> Optional[Tuple[int, np.ndarray, Dict]]:
+        """
+        Return (vector_id, vector, metadata) of an already indexed file with identical content
+        
+        Lets callers list the file under the stored vector (add_aliases)
+        instead of extracting and embedding the same bytes again.
+        """
+        idx = self.hash_to_id.get(content_hash)
+        if idx is None or idx >= self.index.ntotal:
+            return None
+        return idx, self.index.reconstruct(idx), self.metadata[idx]
+    
+    def add_aliases(self, aliases: List[Tuple[int, Dict]]) -> int:
+        """
+        Record more paths for vectors that are already stored
+        
+        Args:
+            aliases: (vector_id, file_info) pairs; file_info has identical
+                     content to the file stored at vector_id
+        
+        Returns:
+            Number of aliases added (ids not in the database are skipped)
+        """
+        added = []
+        for vector_id, file_info in aliases:
+            if not 0 <= vector_id < len(self.metadata):
+                continue
+            alias = self._file_entry(file_info)
+            # A new dict rather than an update: callers may still hold the stored one
+            primary = self.metadata[vector_id]
+            self.metadata[vector_id] = {**primary, 'aliases': [*primary.get('aliases', ()), alias]}
+            self.file_list.append(alias)
+            if primary.get('content_hash'):
+                self.path_hashes[alias['path']] = primary['content_hash']
+            added.append((vector_id, alias))
+        
+        if added:
+            self._unlogged.append((None, added))
+            self.version += 1
+        return len(added)
+    
+    def _prepare_vectors(self, embeddings: np.ndarray) -> np.ndarray:
+        """Return a 2D contiguous float32 copy of embeddings scaled to unit length"""
+        # Always a copy: normalize_L2 works in place and the caller's array
+        # (a scan's row matrix, a cached query vector) must stay as it was
+        embeddings = np.array(embeddings, dtype=np.float32, order='C', copy=True)
+        if embeddings.ndim == 1:
+            embeddings = embeddings.reshape(1, -1)
+        
+        faiss.normalize_L2(embeddings)
+        return embeddings
+    
+    def _maybe_upgrade_index(self):
+        """
+        Grow the index type with the corpus:
+        flat -> int8 scalar quantizer (SQ_THRESHOLD) -> HNSW over int8 (HNSW_THRESHOLD)
+        
+        Without quantization the flat index goes straight to HNSW over float32.
+        """
+        ntotal = self.index.ntotal
+        
+        if not self.quantize:
+            if isinstance(self.index, faiss.IndexFlat) and ntotal >= self.HNSW_THRESHOLD:
+                index = faiss.IndexHNSWFlat(self.dimension, self.HNSW_M, faiss.METRIC_INNER_PRODUCT)
+                index.hnsw.efConstruction = self.HNSW_EF_CONSTRUCTION
+                self._rebuild_index(index, "HNSW (float32)")
+                self._configure_search()
+            return
+        
+        if isinstance(self.index, faiss.IndexFlat) and ntotal >= self.SQ_THRESHOLD:
+            self._rebuild_index(
+                faiss.IndexScalarQuantizer(
+                    self.dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+                ),
+                "int8 scalar quantizer"
+            )
+        
+        if isinstance(self.index, faiss.IndexScalarQuantizer) and ntotal >= self.HNSW_THRESHOLD:
+            index = faiss.IndexHNSWSQ(
+                self.dimension, faiss.ScalarQuantizer.QT_8bit, self.HNSW_M,
+                faiss.METRIC_INNER_PRODUCT
+            )
+            index.hnsw.efConstruction = self.HNSW_EF_CONSTRUCTION
+            self._rebuild_index(index, "HNSW (int8)")
+            self._configure_search()
+    
+    def _configure_search(self):
+        """Apply query-time parameters that are not part of the saved index"""
+        if isinstance(self.index, faiss.IndexHNSW):
+            self.index.hnsw.efSearch = self.HNSW_EF_SEARCH
+    
+    def _rebuild_index(self, index, label: str):
+        """Move every stored vector into a new index, training it on those vectors first"""
+        print(f"[INIT] Upgrading index to {label} ({self.index.ntotal} vectors)...")
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        if not index.is_trained:
+            index.train(vectors)
+        index.add(vectors)
+        self.index = index
+        print(f"[OK] Index upgraded to {label}")
+    
+    def _migrate_l2_index(self):
+        """Convert an index saved by older versions (IndexFlatL2) to normalized inner product"""
+        print("[INIT] Migrating L2 index to inner-product index...")
+        vectors = self._prepare_vectors(self.index.reconstruct_n(0, self.index.ntotal))
+        self.index = faiss.IndexFlatIP(self.dimension)
+        self.index.add(vectors)
+        self._maybe_upgrade_index()
+        print("[OK] Index migrated")
+    
     def add(self, embeddings: np.ndarray, file_info: Dict):
         """
         Add embeddings with metadata to the database
@@ -52,22 +250,22 @@ class FAISSDatabase:
         Args:
             embeddings: Vector embeddings (can be single or batch)
             file_info: Dictionary with file metadata
-                      Required keys: 'path', 'name', 'text'
+                      Required keys: 'path', 'name', 'preview'
                       Optional: 'ext', 'size', 'created', 'modified'
         """
         try:
-            # Ensure embeddings are 2D
-            if embeddings.ndim == 1:
-                embeddings = embeddings.reshape(1, -1)
-            
-            # Convert to float32
-            embeddings = embeddings.astype(np.float32)
+            # 2D, float32, unit length
+            embeddings = self._prepare_vectors(embeddings)
             
             # Add to FAISS index
             self.index.add(embeddings)
             
             # Store metadata
             self.metadata.append(file_info)
+            self._extend_lookups([file_info])
+            self._unlogged.append((embeddings, [file_info]))
+            
+            self._maybe_upgrade_index()
             
             return True
             
@@ -86,15 +284,22 @@ class FAISSDatabase:
         try:
             if len(embeddings) != len(file_infos):
                 raise ValueError("Number of embeddings must match number of file_infos")
-            
-            # Convert to float32
-            embeddings = embeddings.astype(np.float32)
-            
+
+            if len(file_infos) == 0:
+                return True
+
+            # One contiguous block of unit vectors -> a single index.add call
+            embeddings = self._prepare_vectors(embeddings)
+
             # Add to index
             self.index.add(embeddings)
             
             # Store metadata
             self.metadata.extend(file_infos)
+            self._extend_lookups(file_infos)
+            self._unlogged.append((embeddings, list(file_infos)))
+            
+            self._maybe_upgrade_index()
             
             print(f"[OK] Added {len(embeddings)} vectors to database")
             return True
@@ -114,35 +319,59 @@ class FAISSDatabase:
         Returns:
             List of dictionaries with file info and similarity scores
         """
+        results = self.search_batch(query_embedding, k)
+        return results[0] if results else []
+    
+    def search_batch(self, query_embeddings: np.ndarray, k: int = 5) -> List[List[Dict]]:
+        """
+        Search for several query vectors with a single index.search call
+        
+        Args:
+            query_embeddings: Matrix of query vectors (n_queries x dimension)
+            k: Number of results to return per query
+            
+        Returns:
+            One result list (as returned by search) per query row
+        """
         try:
             if self.index.ntotal == 0:
                 print("[WARN]  Database is empty")
                 return []
             
-            # Ensure query is 2D
-            if query_embedding.ndim == 1:
-                query_embedding = query_embedding.reshape(1, -1)
-            
-            # Convert to float32
-            query_embedding = query_embedding.astype(np.float32)
+            # 2D, float32, unit length
+            query_embeddings = self._prepare_vectors(query_embeddings)
             
             # Limit k to available vectors
+            n_results = k
             k = min(k, self.index.ntotal)
             
-            # Search
-            distances, indices = self.index.search(query_embedding, k)
+            # Search (inner product of unit vectors == cosine similarity)
+            scores, indices = self.index.search(query_embeddings, k)
             
-            # Prepare results
-            results = []
-            for i, (dist, idx) in enumerate(zip(distances[0], indices[0])):
-                if idx < len(self.metadata):
-                    result = self.metadata[idx].copy()
-                    result['distance'] = float(dist)
-                    result['similarity_score'] = float(1 / (1 + dist))  # Convert distance to similarity
-                    result['rank'] = i + 1
-                    results.append(result)
+            # Prepare results (scores and ids converted to Python numbers in bulk)
+            metadata = self.metadata
+            n_metadata = len(metadata)
+            batch_results = []
+            for row_scores, row_indices in zip(scores.tolist(), indices.tolist()):
+                results = []
+                for score, idx in zip(row_scores, row_indices):
+                    if 0 <= idx < n_metadata:
+                        # One C-level merge instead of copy() plus four inserts
+                        result = {
+                            **metadata[idx],
+                            'distance': 1 - score,  # Cosine distance
+                            'similarity_score': score,
+                            # Row in the index / metadata (also the BM25 document index)
+                            'doc_id': idx,
+                            'rank': len(results) + 1
+                        }
+                        results.append(result)
+                        # Identical copies of the file match just as well
+                        for alias in metadata[idx].get('aliases', ()):
+                            results.append({**result, **alias, 'rank': len(results) + 1})
+                batch_results.append(results[:n_results])
             
-            return results
+            return batch_results
             
         except Exception as e:
             print(f"[ERROR] Error searching: {e}")
@@ -164,12 +393,17 @@ class FAISSDatabase:
             # Create directory if it doesn't exist
             os.makedirs(os.path.dirname(index_path), exist_ok=True)
             
-            # Save FAISS index
-            faiss.write_index(self.index, index_path)
+            # Write next to the target and swap in, so a crash mid-write
+            # never leaves a truncated index behind
+            faiss.write_index(self.index, index_path + '.tmp')
+            with open(metadata_path + '.tmp', 'wb') as f:
+                pickle.dump(self.metadata, f, protocol=PICKLE_PROTOCOL)
+            os.replace(index_path + '.tmp', index_path)
+            os.replace(metadata_path + '.tmp', metadata_path)
             
-            # Save metadata
-            with open(metadata_path, 'wb') as f:
-                pickle.dump(self.metadata, f)
+            # Everything in the log is now part of the index file
+            if index_path == self.index_path:
+                self._reset_log()
             
             print(f"[OK] Database saved to {index_path}")
             return True
@@ -198,15 +432,27 @@ class FAISSDatabase:
             
             # Load FAISS index
             self.index = faiss.read_index(index_path)
+            if self.index.metric_type == faiss.METRIC_L2:
+                self._migrate_l2_index()
+            self._configure_search()
             
             # Load metadata
             if os.path.exists(metadata_path):
                 with open(metadata_path, 'rb') as f:
                     self.metadata = pickle.load(f)
+                
+                # Older metadata stored the full extracted text per file
+                for file_info in self.metadata:
+                    if 'text' in file_info:
+                        file_info['preview'] = file_info.pop('text')[:PREVIEW_CHARS]
             else:
                 self.metadata = []
+            self._rebuild_lookups()
+            self.saved_count = self.logged_count = self.index.ntotal
+            self._unlogged = []
             
             print(f"[OK] Loaded database with {self.index.ntotal} vectors")
+            self._replay_log()
             return True
             
         except Exception as e:
@@ -214,6 +460,87 @@ class FAISSDatabase:
             self._create_new_index()
             return False
     
+    def flush(self):
+        """
+        Make vectors added since the last flush durable
+        
+        Appends them (and new aliases) to the log file instead of rewriting
+        the whole index; once COMPACT_EVERY vectors are pending, compacts
+        with a full save.
+        """
+        if not self._unlogged:
+            return True
+        
+        if self.index.ntotal - self.saved_count >= self.COMPACT_EVERY:
+            return self.save()
+        
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            with open(self.log_path, 'ab') as f:
+                for vectors, file_infos in self._unlogged:
+                    pickle.dump((vectors, file_infos), f, protocol=PICKLE_PROTOCOL)
+            
+            self.logged_count = self.index.ntotal
+            self._unlogged = []
+            return True
+            
+        except Exception as e:
+            print(f"[ERROR] Error writing database log: {e}")
+            return False
+    
+    def compact(self):
+        """Fold the log into the index file (full save) if anything is pending"""
+        if self._unlogged or os.path.exists(self.log_path):
+            return self.save()
+        return True
+    
+    def _reset_log(self):
+        """Forget the log after a full save"""
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        self.saved_count = self.logged_count = self.index.ntotal
+        self._unlogged = []
+    
+    def _replay_log(self):
+        """Re-add vectors that were flushed to the log after the last full save"""
+        if not os.path.exists(self.log_path):
+            return
+        
+        replayed = 0
+        damaged_at = None
+        log_size = os.path.getsize(self.log_path)
+        with open(self.log_path, 'rb') as f:
+            while True:
+                record_start = f.tell()
+                try:
+                    vectors, file_infos = pickle.load(f)
+                except EOFError:
+                    # A record cut within its first bytes also ends in EOFError;
+                    # only a stop exactly at the end of the file is clean
+                    if record_start < log_size:
+                        print("[WARN]  Stopping log replay at a damaged record: truncated")
+                        damaged_at = record_start
+                    break
+                except Exception as e:
+                    # A record cut short by a crash; everything before it is intact
+                    print(f"[WARN]  Stopping log replay at a damaged record: {e}")
+                    damaged_at = record_start
+                    break
+                
+                if vectors is None:
+                    self.add_aliases(file_infos)
+                else:
+                    self.add_batch(vectors, file_infos)
+                    replayed += len(file_infos)
+        
+        if damaged_at is not None:
+            # Drop the damaged tail so later appends stay readable
+            os.truncate(self.log_path, damaged_at)
+        
+        self.logged_count = self.index.ntotal
+        self._unlogged = []
+        print(f"[OK] Replayed {replayed} logged vectors")
+    
     def get_stats(self) -> Dict:
         """
         Get database statistics
@@ -223,6 +550,8 @@ class FAISSDatabase:
         """
         return {
             'total_vectors': self.index.ntotal if self.index else 0,
+            # Files with identical content share a vector, so this can be larger
+            'total_files': len(self.file_list),
             'dimension': self.dimension,
             'metadata_count': len(self.metadata),
             'index_path': self.index_path
@@ -248,7 +577,7 @@ if __name__ == "__main__":
     print("Test 2: Adding vectors")
     test_vectors = np.random.rand(5, 384).astype(np.float32)
     test_files = [
-        {'path': f'/path/to/file{i}.pdf', 'name': f'file{i}.pdf', 'text': f'Sample text {i}'}
+        {'path': f'/path/to/file{i}.pdf', 'name': f'file{i}.pdf', 'preview': f'Sample text {i}'}
         for i in range(5)
     ]
     
@@ -0,0 +1,78 @@
+"""
+Query Coalescing for NeuroDrive
+Batches concurrent single-query searches into one FAISS index.search call
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List
+
+import numpy as np
+
+
+class QueryCoalescer:
+    """
+    Collects searches that arrive within `window` seconds of each other and
+    runs them as a single (n_queries x dimension) search on the database.
+
+    The first caller in a window becomes the leader: it takes every pending
+    query and resolves the other callers' futures. It only waits out the
+    window while another batch is already searching, since that is when
+    more queries are likely to pile up; a query that arrives while the
+    database is idle runs at once.
+    """
+
+    def __init__(self, db, window: float = 0.005, max_batch: int = 64):
+        self.db = db
+        self.window = window
+        self.max_batch = max_batch
+        self.lock = threading.Lock()
+        self.pending = []  # (query_embedding, k, Future)
+        self.leader_active = False
+        self.in_flight = 0  # batches currently inside db.search_batch
+
+    def search(self, query_embedding: np.ndarray, k: int = 5) -> List[Dict]:
+        """Drop-in replacement for db.search that may share a batch with other threads"""
+        future = Future()
+
+        with self.lock:
+            self.pending.append((query_embedding, k, future))
+            is_leader = not self.leader_active
+            self.leader_active = True
+            flush_now = len(self.pending) >= self.max_batch
+            busy = self.in_flight > 0
+
+        if is_leader:
+            if busy and not flush_now:
+                time.sleep(self.window)
+            self._flush()
+        elif flush_now:
+            # The batch is full: run it now rather than waiting for the leader
+            self._flush()
+
+        return future.result()
+
+    def _flush(self):
+        """Run every pending query as one batched search"""
+        with self.lock:
+            batch, self.pending = self.pending, []
+            self.leader_active = False
+            if not batch:
+                return
+            self.in_flight += 1
+
+        try:
+            queries = np.vstack([np.asarray(q, dtype=np.float32).reshape(1, -1) for q, _, _ in batch])
+            k = max(k for _, k, _ in batch)
+            results = self.db.search_batch(queries, k)
+
+            for i, (_, query_k, future) in enumerate(batch):
+                future.set_result(results[i][:query_k] if i < len(results) else [])
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
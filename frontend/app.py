@@ -1,12 +1,22 @@
 ﻿import streamlit as st
-import requests
-import pandas as pd
+import httpx
+import csv
+import io
 from datetime import datetime
-import time
+import json
 import os
-import tempfile
+import threading
+import time
+from collections import deque
 from pathlib import Path
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 st.set_page_config(
     page_title='NeuroDrive - Semantic File Search',
     page_icon='🧠',
@@ -14,57 +24,276 @@ st.set_page_config(
     initial_sidebar_state='expanded'
 )
 
-st.markdown("""
-<style>
-    #MainMenu {visibility: hidden;}
-    footer {visibility: hidden;}
-    .stButton>button {
-        border-radius: 10px;
-        font-weight: bold;
-        transition: all 0.3s;
-    }
-    .stButton>button:hover {
-        transform: scale(1.05);
-    }
-</style>
-""", unsafe_allow_html=True)
+STYLES_PATH = Path(__file__).parent / 'static' / 'styles.css'
+# Searches kept per session for the Analytics tab; older entries drop off
+SEARCH_HISTORY_LIMIT = 200
+
+# Per-result header, filled with .format() so each result is one markdown element
+RESULT_SUMMARY_TEMPLATE = (
+    '**Path:** `{path}`  \n'
+    '**Score:** {score:.1%} &nbsp;|&nbsp; **Type:** {file_type} &nbsp;|&nbsp; **Method:** {method}'
+)
+RESULT_BREAKDOWN_TEMPLATE = (
+    '  \n**Score Breakdown:** Semantic {semantic:.3f} &nbsp;|&nbsp; Keyword (BM25) {bm25:.3f}'
+)
+# Previews of these file types are shown as code
+CODE_PREVIEW_EXTS = frozenset({'.py', '.js', '.java', '.cpp'})
+
+# Progress polling (when the backend can't stream): fast right after a job
+# starts or moves, backing off while nothing changes
+POLL_START_SECONDS = 0.3
+POLL_RESET_SECONDS = 0.5
+POLL_MAX_SECONDS = 10.0
+POLL_BACKOFF = 1.5
+
+@st.cache_resource
+def load_css():
+    return STYLES_PATH.read_text(encoding='utf-8')
+
+st.markdown(f'<style>{load_css()}</style>', unsafe_allow_html=True)
+
+@st.cache_resource
+def get_client(api_url):
+    # One pooled keep-alive connection to the backend, shared across reruns;
+    # the transport retries connects that fail while the backend restarts
+    return httpx.Client(
+        base_url=api_url,
+        timeout=30,
+        transport=httpx.HTTPTransport(
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=8),
+            retries=2
+        )
+    )
 
 if 'api_url' not in st.session_state:
     st.session_state.api_url = 'http://127.0.0.1:8000'
 if 'indexed_files' not in st.session_state:
     st.session_state.indexed_files = 0
 if 'search_history' not in st.session_state:
-    st.session_state.search_history = []
+    st.session_state.search_history = deque(maxlen=SEARCH_HISTORY_LIMIT)
 if 'last_search_results' not in st.session_state:
     st.session_state.last_search_results = None
 if 'indexing_job_id' not in st.session_state:
     st.session_state.indexing_job_id = None
+if 'indexing_progress' not in st.session_state:
+    st.session_state.indexing_progress = None
+if 'progress_stream_available' not in st.session_state:
+    st.session_state.progress_stream_available = True
+if 'history_version' not in st.session_state:
+    st.session_state.history_version = 0
+if 'history_summary' not in st.session_state:
+    st.session_state.history_summary = None
 
+@st.cache_data(show_spinner=False)
 def export_results_to_csv(results):
     if not results:
         return None
-    data = []
+    # Plain csv module: a handful of rows doesn't need pandas loaded
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(['Rank', 'File Name', 'Path', 'Score', 'Type', 'Method'])
     for r in results:
-        data.append({
-            'Rank': r['rank'],
-            'File Name': r['name'],
-            'Path': r['path'],
-            'Score': r.get('hybrid_score') or r.get('similarity_score', 0),
-            'Type': r['file_type'],
-            'Method': r['search_method']
-        })
-    df = pd.DataFrame(data)
-    return df.to_csv(index=False)
-
-def check_indexing_progress(api_url, job_id):
+        writer.writerow([
+            r['rank'],
+            r['name'],
+            r['path'],
+            r['score'],
+            r['file_type'],
+            r['search_method']
+        ])
+    return buffer.getvalue()
+
+def summarize_history():
+    # Rebuilt only when a search lands or the history is cleared;
+    # other reruns reuse the frame and its aggregates
+    summary = st.session_state.history_summary
+    if summary is not None and summary['version'] == st.session_state.history_version:
+        return summary
+    
+    # pandas is imported on first use; sessions that never search skip it
+    import pandas as pd
+    df = pd.DataFrame(st.session_state.search_history)
+    summary = {
+        'version': st.session_state.history_version,
+        'df': df,
+        'avg_results': df['results'].mean(),
+        'avg_time': df['time_ms'].mean(),
+        'result_counts': df['results'].value_counts().sort_index(),
+        'recent': df[['timestamp', 'query', 'results', 'method', 'time_ms']].tail(10)
+    }
+    st.session_state.history_summary = summary
+    return summary
+
+# Re-submitting the same search within the TTL skips the backend entirely;
+# _misses is excluded from the key and only records that the POST ran
+@st.cache_data(ttl=60, show_spinner=False)
+def search_backend(api_url, query, k, use_context, use_hybrid, min_score, _misses):
+    _misses.append(query)
+    response = get_client(api_url).post(
+        '/search/',
+        json={
+            'query': query,
+            'k': k,
+            'use_context': use_context,
+            'use_hybrid': use_hybrid,
+            'min_score': min_score
+        },
+        timeout=30
+    )
+    response.raise_for_status()
+    results = response.json()
+    # One display score per result, read by both the result list and CSV export
+    for r in results['results']:
+        r['score'] = r.get('hybrid_score') or r.get('similarity_score', 0)
+    return results
+
+@st.cache_resource
+def get_files_store(api_url):
+    # Last /get_file/ payload and its ETag, shared across reruns
+    return {}
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_files(api_url):
+    store = get_files_store(api_url)
+    headers = {'If-None-Match': store['etag']} if 'etag' in store else {}
+    response = get_client(api_url).get('/get_file/', headers=headers, timeout=10)
+    
+    # 304: the backend's file list has not changed, reuse the parsed payload
+    if response.status_code == 304:
+        return store['data']
+    
+    response.raise_for_status()
+    data = response.json()
+    if 'etag' in response.headers:
+        store['etag'] = response.headers['etag']
+        store['data'] = data
+    return data
+
+# Health and cache stats come back together; status panels rerun often,
+# and within the TTL they share one round-trip
+@st.cache_data(ttl=5, show_spinner=False)
+def fetch_status(api_url):
+    response = get_client(api_url).get('/search/status', timeout=5)
+    response.raise_for_status()
+    return response.json()
+
+@st.cache_data(show_spinner=False)
+def summarize_files(files):
+    import pandas as pd
+    columns = ['name', 'ext', 'size']
+    if not files:
+        return {}, 0, pd.DataFrame(columns=columns)
+    
+    # Counts and sums run over columnar buffers instead of Python dict loops
+    if PYARROW_AVAILABLE:
+        table = pa.Table.from_pylist(files).select(columns)
+        ext_counts = {
+            row['values']: row['counts']
+            for row in pc.value_counts(table['ext']).to_pylist()
+        }
+        total_size = pc.sum(table['size']).as_py() or 0
+        return ext_counts, total_size, table.to_pandas()
+    
+    df = pd.DataFrame(files, columns=columns)
+    return df['ext'].value_counts().to_dict(), int(df['size'].sum()), df
+
+def check_indexing_progress(client, job_id):
     try:
-        response = requests.get(f'{api_url}/scan/progress/{job_id}', timeout=3)
+        response = client.get(f'/scan/progress/{job_id}', timeout=3)
         if response.status_code == 200:
             return response.json()
     except:
         pass
     return None
 
+class ProgressPoller:
+    '''Polls one job's progress on a background thread until it finishes'''
+    
+    def __init__(self, client, job_id):
+        self.latest = None
+        self.finished = False
+        # Only touches the HTTP client, never Streamlit, so it needs no script context
+        threading.Thread(target=self._run, args=(client, job_id), daemon=True).start()
+    
+    def _run(self, client, job_id):
+        interval = POLL_START_SECONDS
+        while True:
+            progress_data = check_indexing_progress(client, job_id)
+            
+            # Fast while the job moves, backing off while it stalls
+            if self.latest is not None:
+                advanced = (
+                    progress_data is not None and
+                    progress_data.get('processed') != self.latest.get('processed')
+                )
+                interval = (
+                    POLL_RESET_SECONDS if advanced
+                    else min(interval * POLL_BACKOFF, POLL_MAX_SECONDS)
+                )
+            
+            # latest first: a reader that sees finished also sees the final result
+            self.latest = progress_data
+            self.finished = not progress_data or progress_data.get('status') != 'processing'
+            
+            if self.finished:
+                return
+            time.sleep(interval)
+
+# One poller per job, shared by every session following it; finished
+# pollers age out instead of staying for the life of the server
+@st.cache_resource(ttl=3600, max_entries=32)
+def get_progress_poller(api_url, job_id):
+    return ProgressPoller(get_client(api_url), job_id)
+
+def render_polled_progress(poller):
+    # Runs as a timed fragment (see the sidebar) and only reads what the
+    # poller thread last saw, so no run ever waits on the backend
+    if poller.latest is not None:
+        st.session_state.indexing_progress = poller.latest
+    if poller.finished:
+        # A full rerun draws the final state and stops the timer
+        st.rerun()
+    if st.session_state.indexing_progress:
+        render_progress(st.session_state.indexing_progress)
+
+def render_progress(progress_data):
+    status = progress_data.get('status', 'unknown')
+    processed = progress_data.get('processed', 0)
+    total = progress_data.get('total', 1)
+    indexed = progress_data.get('indexed', 0)
+    
+    progress_pct = (processed / total) * 100 if total > 0 else 0
+    
+    st.progress(progress_pct / 100)
+    st.write(f'**Status:** {status}')
+    st.write(f'**Processed:** {processed}/{total}')
+    st.write(f'**Indexed:** {indexed}')
+
+def follow_indexing_progress(api_url, job_id, slot):
+    # The backend pushes an event only when the job advances; the backend's
+    # keep-alives arrive well inside the read timeout
+    try:
+        with get_client(api_url).stream(
+            'GET',
+            f'/scan/progress/{job_id}/stream',
+            timeout=httpx.Timeout(10, read=60)
+        ) as response:
+            if response.status_code != 200:
+                # Older backend without the stream: poll instead
+                st.session_state.progress_stream_available = False
+            else:
+                for line in response.iter_lines():
+                    if not line.startswith('data: '):
+                        continue
+                    st.session_state.indexing_progress = json.loads(line[len('data: '):])
+                    with slot.container():
+                        render_progress(st.session_state.indexing_progress)
+    except httpx.HTTPError:
+        st.session_state.progress_stream_available = False
+    
+    # Redraw the sidebar with the final state (or switch to polling)
+    st.rerun()
+
 with st.sidebar:
     st.title('Settings')
     
@@ -84,49 +313,73 @@ with st.sidebar:
     st.subheader('Quick Stats')
     if st.button('Refresh Stats'):
         try:
-            response = requests.get(f'{api_url}/search/health')
-            if response.status_code == 200:
-                health = response.json()
-                st.session_state.indexed_files = health.get('documents_indexed', 0)
+            health = fetch_status(api_url)['health']
+            st.session_state.indexed_files = health.get('documents_indexed', 0)
         except:
             pass
     
     st.metric('Indexed Files', st.session_state.indexed_files)
     st.metric('Searches', len(st.session_state.search_history))
     
+    # Streamed updates fill this at the end of the run, once the page is drawn;
+    # polled updates come from a timed fragment instead
+    progress_slot = None
     if st.session_state.indexing_job_id:
         st.divider()
         st.subheader('Indexing Progress')
-        progress_data = check_indexing_progress(api_url, st.session_state.indexing_job_id)
-        
-        if progress_data and progress_data.get('status') != 'not_found':
-            status = progress_data.get('status', 'unknown')
-            processed = progress_data.get('processed', 0)
-            total = progress_data.get('total', 1)
-            indexed = progress_data.get('indexed', 0)
-            
-            progress_pct = (processed / total) * 100 if total > 0 else 0
+        poller = None
+        if not st.session_state.progress_stream_available:
+            poller = get_progress_poller(api_url, st.session_state.indexing_job_id)
+            if poller.finished and poller.latest is not None:
+                st.session_state.indexing_progress = poller.latest
+        progress_data = st.session_state.indexing_progress
+        
+        if poller is not None and not poller.finished:
+            # Only this block reruns on the timer, not the page
+            st.fragment(run_every=POLL_RESET_SECONDS)(render_polled_progress)(poller)
+        else:
+            progress_slot = st.empty()
+        
+        if progress_slot is not None and progress_data and progress_data.get('status') != 'not_found':
+            with progress_slot.container():
+                render_progress(progress_data)
             
-            st.progress(progress_pct / 100)
-            st.write(f'**Status:** {status}')
-            st.write(f'**Processed:** {processed}/{total}')
-            st.write(f'**Indexed:** {indexed}')
-            
-            if status == 'completed':
+            if progress_data.get('status') == 'completed':
                 st.success('Indexing complete!')
                 if st.button('Clear Progress'):
                     st.session_state.indexing_job_id = None
-                    st.rerun()
-            else:
-                if st.button('Refresh Progress'):
+                    st.session_state.indexing_progress = None
                     st.rerun()
 
 st.title('NeuroDrive v2.0')
 st.caption('AI-Powered Semantic File Search System')
 
-tab1, tab2, tab3, tab4 = st.tabs(['Search', 'Index Files', 'Analytics', 'System'])
+# Interacting with one result (e.g. its preview box) reruns only that result;
+# rerunning the search view would drop the list, which is drawn only after a search
+@st.fragment
+def render_result(i, result):
+    with st.expander(f"#{i} - {result['name']}", expanded=(i==1)):
+        summary = RESULT_SUMMARY_TEMPLATE.format(
+            path=result['path'],
+            score=result['score'],
+            file_type=result['file_type'],
+            method=result.get('search_method', 'N/A')
+        )
+        semantic, bm25 = result.get('semantic_score'), result.get('bm25_score')
+        if semantic and bm25:
+            summary += RESULT_BREAKDOWN_TEMPLATE.format(semantic=semantic, bm25=bm25)
+        st.markdown(summary + '  \n**Preview:**')
+        
+        preview = result.get('preview', 'No preview available')
+        
+        if result['file_type'] in CODE_PREVIEW_EXTS:
+            st.code(preview, language='python')
+        else:
+            st.text_area('', preview, height=150, key=f'preview_{i}', label_visibility='collapsed')
 
-with tab1:
+# Each view is a fragment: widget interaction inside a view reruns only that view
+@st.fragment
+def render_search(api_url, num_results, use_context, use_hybrid, min_score):
     st.header('Search Your Files')
     
     query = st.text_input(
@@ -141,15 +394,16 @@ with tab1:
     
     with col2:
         if st.session_state.last_search_results:
-            if st.button('Export CSV', use_container_width=True):
-                csv = export_results_to_csv(st.session_state.last_search_results.get('results', []))
-                if csv:
-                    st.download_button(
-                        'Download',
-                        csv,
-                        file_name=f'search_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
-                        mime='text/csv'
-                    )
+            # Serialized once per result set, then reused on every rerun
+            csv = export_results_to_csv(st.session_state.last_search_results.get('results', []))
+            if csv:
+                st.download_button(
+                    'Export CSV',
+                    csv,
+                    file_name=f'search_results_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv',
+                    mime='text/csv',
+                    use_container_width=True
+                )
     
     with col3:
         if st.button('Clear', use_container_width=True):
@@ -159,77 +413,49 @@ with tab1:
     if search_button and query:
         with st.spinner('Searching...'):
             try:
-                response = requests.post(
-                    f'{api_url}/search/',
-                    json={
-                        'query': query,
-                        'k': num_results,
-                        'use_context': use_context,
-                        'use_hybrid': use_hybrid,
-                        'min_score': min_score
-                    },
-                    timeout=30
+                misses = []
+                results = search_backend(
+                    api_url, query, num_results, use_context, use_hybrid, min_score, misses
                 )
                 
-                if response.status_code == 200:
-                    results = response.json()
-                    st.session_state.last_search_results = results
-                    
-                    st.session_state.search_history.append({
-                        'query': query,
-                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        'results': results['count'],
-                        'method': results['search_method'],
-                        'time_ms': results['processing_time_ms']
-                    })
-                    
-                    method = results['search_method']
+                st.session_state.last_search_results = results
+                
+                st.session_state.search_history.append({
+                    'query': query,
+                    'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'results': results['count'],
+                    'method': results['search_method'],
+                    'time_ms': results['processing_time_ms']
+                })
+                st.session_state.history_version += 1
+                
+                method = results['search_method']
+                if not misses:
+                    cache = 'LOCAL'
+                else:
                     cache = 'CACHED' if results.get('cache_hit') else 'NEW'
-                    time_ms = results['processing_time_ms']
-                    
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        st.metric('Results', results['count'])
-                    with col2:
-                        st.metric('Method', method.title())
-                    with col3:
-                        st.metric('Cache', cache)
-                    with col4:
-                        st.metric('Time', f'{time_ms:.0f}ms')
-                    
-                    st.divider()
-                    
-                    if results['count'] > 0:
-                        for i, result in enumerate(results['results'], 1):
-                            with st.expander(f"#{i} - {result['name']}", expanded=(i==1)):
-                                st.write(f"**Path:** `{result['path']}`")
-                                
-                                col1, col2, col3 = st.columns(3)
-                                with col1:
-                                    score = result.get('hybrid_score') or result.get('similarity_score', 0)
-                                    st.metric('Score', f'{score:.1%}')
-                                with col2:
-                                    st.metric('Type', result['file_type'])
-                                with col3:
-                                    st.metric('Method', result.get('search_method', 'N/A'))
-                                
-                                if result.get('semantic_score') and result.get('bm25_score'):
-                                    st.write('**Score Breakdown:**')
-                                    st.write(f"- Semantic: {result['semantic_score']:.3f}")
-                                    st.write(f"- Keyword (BM25): {result['bm25_score']:.3f}")
-                                
-                                st.write('**Preview:**')
-                                preview = result.get('preview', 'No preview available')
-                                
-                                if result['file_type'] in ['.py', '.js', '.java', '.cpp']:
-                                    st.code(preview, language='python')
-                                else:
-                                    st.text_area('', preview, height=150, key=f'preview_{i}', label_visibility='collapsed')
-                    else:
-                        st.warning('No results found.')
+                time_ms = results['processing_time_ms']
+                
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric('Results', results['count'])
+                with col2:
+                    st.metric('Method', method.title())
+                with col3:
+                    st.metric('Cache', cache)
+                with col4:
+                    st.metric('Time', f'{time_ms:.0f}ms')
+                
+                st.divider()
+                
+                if results['count'] > 0:
+                    for i, result in enumerate(results['results'], 1):
+                        render_result(i, result)
                 else:
-                    st.error(f'Error: {response.status_code}')
-                    
+                    st.warning('No results found.')
+            
+            except httpx.HTTPStatusError as e:
+                st.error(f'Error: {e.response.status_code}')
             except Exception as e:
                 st.error(f'Error: {str(e)}')
     
@@ -237,7 +463,8 @@ with tab1:
         results = st.session_state.last_search_results
         st.info(f'Showing {results["count"]} results from last search: "{results["query"]}"')
 
-with tab2:
+@st.fragment
+def render_indexing(api_url):
     st.header('Index New Files')
     
     index_tab1, index_tab2 = st.tabs(['Folder Path', 'Upload Files'])
@@ -278,8 +505,8 @@ with tab2:
             if folder_path:
                 with st.spinner('Starting indexing...'):
                     try:
-                        response = requests.post(
-                            f'{api_url}/scan/',
+                        response = get_client(api_url).post(
+                            '/scan/',
                             json={
                                 'folder_path': folder_path,
                                 'max_files': max_files,
@@ -291,12 +518,14 @@ with tab2:
                         if response.status_code == 200:
                             result = response.json()
                             st.session_state.indexing_job_id = result['job_id']
-                            st.success('Indexing started!')
-                            st.info(f'Job ID: {result["job_id"]}')
-                            st.info(f'Files to process: {result["files_to_process"]}')
-                            st.info(f'Estimated time: ~{result["estimated_time_seconds"]:.0f}s')
-                            st.info('Check progress in the sidebar!')
-                            time.sleep(1)
+                            search_backend.clear()
+                            st.session_state.indexing_progress = None
+                            st.session_state.progress_stream_available = True
+                            # Toasts survive the rerun that brings up the sidebar progress
+                            st.toast(
+                                f'Indexing started: {result["files_to_process"]} files '
+                                f'(~{result["estimated_time_seconds"]:.0f}s). Check progress in the sidebar!'
+                            )
                             st.rerun()
                         else:
                             st.error(f'Error: {response.status_code}')
@@ -325,38 +554,54 @@ with tab2:
                 status_text = st.empty()
                 
                 try:
-                    with tempfile.TemporaryDirectory() as temp_dir:
-                        status_text.text('Saving files...')
-                        for i, uploaded_file in enumerate(uploaded_files):
-                            file_path = Path(temp_dir) / uploaded_file.name
-                            with open(file_path, 'wb') as f:
-                                f.write(uploaded_file.getbuffer())
-                            progress_bar.progress((i + 1) / (len(uploaded_files) * 2))
-                        
-                        status_text.text('Creating embeddings...')
-                        response = requests.post(
-                            f'{api_url}/scan/sync',
-                            json={'folder_path': temp_dir},
-                            timeout=300
-                        )
-                        
-                        progress_bar.progress(1.0)
+                    status_text.text('Uploading files...')
+                    result = None
+                    
+                    # The backend streams one JSON line per real progress update
+                    with get_client(api_url).stream(
+                        'POST',
+                        '/scan/upload',
+                        params={'stream': True},
+                        files=[('files', (f.name, f.getvalue())) for f in uploaded_files],
+                        timeout=300
+                    ) as response:
+                        if response.status_code != 200:
+                            response.read()
+                            st.error(f'Error: {response.status_code}')
+                        else:
+                            for line in response.iter_lines():
+                                if not line:
+                                    continue
+                                event = json.loads(line)
+                                
+                                if event.get('phase') == 'index':
+                                    total = event.get('total') or 1
+                                    progress_bar.progress(min(event.get('processed', 0) / total, 1.0))
+                                    status_text.text(
+                                        f"Creating embeddings... {event.get('processed', 0)}/{total} "
+                                        f"({event.get('indexed', 0)} indexed)"
+                                    )
+                                elif event.get('phase') == 'error':
+                                    st.error(f"Error: {event.get('detail')}")
+                                else:
+                                    result = event
+                    
+                    if result:
+                        status_text.empty()
+                        progress_bar.empty()
                         
-                        if response.status_code == 200:
-                            result = response.json()
-                            status_text.empty()
-                            progress_bar.empty()
-                            
+                        if 'files_processed' in result:
                             st.success(f'Successfully indexed {result["files_indexed"]} files!')
+                            search_backend.clear()
                             st.balloons()
-                            
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.metric('Scanned', result['files_scanned'])
-                            with col2:
-                                st.metric('Indexed', result['files_indexed'])
                         else:
-                            st.error(f'Error: {response.status_code}')
+                            st.warning(result.get('message', 'Nothing was indexed'))
+                        
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            st.metric('Scanned', result['files_scanned'])
+                        with col2:
+                            st.metric('Indexed', result['files_indexed'])
                 
                 except Exception as e:
                     st.error(f'Error: {str(e)}')
@@ -364,21 +609,21 @@ with tab2:
                     progress_bar.empty()
                     status_text.empty()
 
-with tab3:
+@st.fragment
+def render_analytics(api_url):
     st.header('Search Analytics')
     
     if st.session_state.search_history:
-        df = pd.DataFrame(st.session_state.search_history)
+        summary = summarize_history()
+        df = summary['df']
         
         col1, col2, col3 = st.columns(3)
         with col1:
             st.metric('Total Searches', len(df))
         with col2:
-            avg_results = df['results'].mean()
-            st.metric('Avg Results', f'{avg_results:.1f}')
+            st.metric('Avg Results', f"{summary['avg_results']:.1f}")
         with col3:
-            avg_time = df['time_ms'].mean()
-            st.metric('Avg Time', f'{avg_time:.0f}ms')
+            st.metric('Avg Time', f"{summary['avg_time']:.0f}ms")
         
         st.divider()
         
@@ -386,7 +631,7 @@ with tab3:
         
         with col1:
             st.subheader('Search Results Distribution')
-            st.bar_chart(df['results'].value_counts().sort_index())
+            st.bar_chart(summary['result_counts'])
         
         with col2:
             st.subheader('Response Time Trend')
@@ -395,8 +640,7 @@ with tab3:
         st.divider()
         
         st.subheader('Recent Searches')
-        display_df = df[['timestamp', 'query', 'results', 'method', 'time_ms']].tail(10)
-        st.dataframe(display_df, use_container_width=True)
+        st.dataframe(summary['recent'], use_container_width=True)
         
         if st.button('Download Search History'):
             csv = df.to_csv(index=False)
@@ -408,20 +652,76 @@ with tab3:
             )
         
         if st.button('Clear History'):
-            st.session_state.search_history = []
+            st.session_state.search_history.clear()
+            st.session_state.history_version += 1
             st.rerun()
     else:
         st.info('No search history yet. Perform some searches to see analytics!')
+    
+    st.divider()
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.subheader('Indexed Files')
+    with col2:
+        if st.button('Force Refresh', use_container_width=True):
+            fetch_files.clear()
+    
+    try:
+        files = fetch_files(api_url).get('files', [])
+        ext_counts, total_size, files_df = summarize_files(files)
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric('Files', len(files))
+        with col2:
+            st.metric('File Types', len(ext_counts))
+        with col3:
+            st.metric('Total Size', f'{total_size / (1024 * 1024):.1f} MB')
+        
+        if ext_counts:
+            import pandas as pd
+            st.bar_chart(pd.Series(ext_counts, name='files'))
+            st.dataframe(files_df, use_container_width=True)
+    except Exception:
+        st.warning('Could not load indexed files from the backend')
+
+# A modal keeps the confirm buttons alive across their own reruns, which
+# buttons nested under another button's click never are
+@st.dialog('Confirm delete')
+def confirm_clear_database(api_url):
+    st.warning('WARNING: This will permanently delete ALL indexed files from the database!')
+    
+    col_a, col_b = st.columns(2)
+    with col_a:
+        if st.button('Cancel Operation', use_container_width=True):
+            st.rerun()
+    with col_b:
+        if st.button('YES - DELETE ALL', type='primary', use_container_width=True):
+            try:
+                response = get_client(api_url).delete('/search/database/clear', timeout=10)
+                if response.status_code == 200:
+                    st.toast('Database cleared successfully!')
+                    st.session_state.indexed_files = 0
+                    fetch_status.clear()
+                    search_backend.clear()
+                    st.rerun()
+                else:
+                    st.error(f'Failed: {response.status_code}')
+            except Exception as e:
+                st.error(f'Error: {str(e)}')
 
-with tab4:
+@st.fragment
+def render_system(api_url):
     st.header('System Status')
     
     if st.button('Refresh All', use_container_width=True):
+        fetch_status.clear()
         st.rerun()
     
     try:
-        health = requests.get(f'{api_url}/search/health', timeout=5).json()
-        cache_stats = requests.get(f'{api_url}/search/cache/stats', timeout=5).json()
+        status = fetch_status(api_url)
+        health, cache_stats = status['health'], status['cache_stats']
         
         st.subheader('Health Status')
         col1, col2, col3, col4 = st.columns(4)
@@ -470,9 +770,10 @@ with tab4:
         with col1:
             if st.button('Clear Cache', use_container_width=True):
                 try:
-                    requests.post(f'{api_url}/search/cache/clear')
-                    st.success('Cache cleared!')
-                    time.sleep(0.5)
+                    get_client(api_url).post('/search/cache/clear')
+                    fetch_status.clear()
+                    search_backend.clear()
+                    st.toast('Cache cleared!')
                     st.rerun()
                 except:
                     st.error('Failed to clear cache')
@@ -483,26 +784,7 @@ with tab4:
         st.subheader('Database Management')
         
         if st.button('Clear All Indexed Files', type='secondary', use_container_width=True):
-            st.warning('WARNING: This will permanently delete ALL indexed files from the database!')
-            
-            col_a, col_b = st.columns(2)
-            with col_a:
-                if st.button('Cancel Operation'):
-                    st.rerun()
-            with col_b:
-                if st.button('YES - DELETE ALL', type='primary'):
-                    try:
-                        response = requests.delete(f'{api_url}/search/database/clear', timeout=10)
-                        if response.status_code == 200:
-                            st.success('Database cleared successfully!')
-                            st.session_state.indexed_files = 0
-                            st.balloons()
-                            time.sleep(1)
-                            st.rerun()
-                        else:
-                            st.error(f'Failed: {response.status_code}')
-                    except Exception as e:
-                        st.error(f'Error: {str(e)}')
+            confirm_clear_database(api_url)
 
         st.divider()
         
@@ -516,9 +798,34 @@ with tab4:
         st.error('Cannot connect to backend')
         st.code(str(e))
 
+# st.tabs runs every tab's body on each rerun, even hidden ones; a radio
+# selector lets only the visible view fetch and build anything
+active_tab = st.radio(
+    'View',
+    ['Search', 'Index Files', 'Analytics', 'System'],
+    horizontal=True,
+    key='active_tab',
+    label_visibility='collapsed'
+)
+
+if active_tab == 'Search':
+    render_search(api_url, num_results, use_context, use_hybrid, min_score)
+elif active_tab == 'Index Files':
+    render_indexing(api_url)
+elif active_tab == 'Analytics':
+    render_analytics(api_url)
+else:
+    render_system(api_url)
+
 st.divider()
 st.caption('NeuroDrive v2.0 - AI-Powered Semantic File Search | Hybrid Search | Caching | Analytics')
 
+# Last, so the page is usable while the sidebar follows a running job
+if progress_slot is not None and st.session_state.progress_stream_available:
+    progress_data = st.session_state.indexing_progress
+    if not progress_data or progress_data.get('status') == 'processing':
+        follow_indexing_progress(api_url, st.session_state.indexing_job_id, progress_slot)
+
 
 
 